@@ -1,13 +1,23 @@
 """FastAPI endpoints for extraction logs + serves frontend static files."""
+import asyncio
+import base64
+import json
+import time
+import uuid
+from datetime import datetime
 from pathlib import Path
 
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from sqlalchemy import text
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
-from app.db import engine
+from app.config import API_CACHE_MAX_MB, API_RUNS_CACHE_TTL
+from app.db_async import fetch_all, pool_status
+from app.live import broadcaster, rows_after
+from app.metrics import API_REQUEST_SECONDS
+from app.response_cache import ResponseCache, encode, etag_response
 
 app = FastAPI(title="Contact Report Extraction Logs")
 
@@ -20,6 +30,47 @@ app.add_middleware(
 
 FRONTEND_DIST = Path(__file__).parent.parent / "frontend" / "dist"
 
+# Logs of completed runs never change; the runs list is only cached briefly
+logs_cache = ResponseCache(API_CACHE_MAX_MB << 20)
+runs_cache = ResponseCache(8 << 20, ttl=API_RUNS_CACHE_TTL)
+_cache_listener = False
+
+
+def _invalidate_caches(run_id: str | None):
+    """New log rows for `run_id` (None: unknown, e.g. after a LISTEN reconnect)."""
+    runs_cache.invalidate()
+    try:
+        prefix = f"{uuid.UUID(run_id)}|" if run_id else ""
+    except ValueError:
+        prefix = ""
+    logs_cache.invalidate(prefix)
+
+
+def _ensure_cache_invalidation():
+    global _cache_listener
+    if not _cache_listener:
+        broadcaster.add_listener(_invalidate_caches)
+        _cache_listener = True
+
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    """API latency per route template (not per raw path, to keep label cardinality bounded)."""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    if route is not None and request.url.path.startswith("/api"):
+        API_REQUEST_SECONDS.labels(request.method, route.path, response.status_code).observe(
+            time.perf_counter() - started
+        )
+    return response
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus exposition of app.metrics for this process (plus the pipeline when the scheduler runs here)."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 
 @app.get("/api/health")
 def health():
@@ -27,83 +78,348 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/api/health/db")
+async def health_db():
+    """API connection pool occupancy, checkout wait, query latency and response caches."""
+    return {
+        **pool_status(),
+        "cache": {"logs": logs_cache.stats(), "runs": runs_cache.stats()},
+    }
+
+
 @app.get("/api/runs")
-def list_runs(
+async def list_runs(
+    request: Request,
     date_from: str | None = Query(None, description="YYYY-MM-DD"),
     date_to: str | None = Query(None, description="YYYY-MM-DD"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
 ):
-    """List pipeline runs with summary stats."""
+    """List pipeline runs with summary stats, newest first, keyset-paginated."""
+    _ensure_cache_invalidation()
+    key = f"{date_from}|{date_to}|{limit}|{cursor}"
+    cached = runs_cache.get(key)
+    if cached is None:
+        generation = runs_cache.generation
+        cached = encode(await _query_runs(date_from, date_to, limit, cursor))
+        runs_cache.put(key, *cached, generation)
+    return etag_response(request, *cached, "no-cache")
+
+
+async def _query_runs(date_from: str | None, date_to: str | None, limit: int, cursor: str | None) -> dict:
     where_clauses = []
-    params = {}
+    params = {"limit": limit}
 
     if date_from:
-        where_clauses.append("created_at >= CAST(:date_from AS date)")
+        where_clauses.append("started_at >= CAST(:date_from AS date)")
         params["date_from"] = date_from
     if date_to:
-        where_clauses.append("created_at < CAST(:date_to AS date) + interval '1 day'")
+        where_clauses.append("started_at < CAST(:date_to AS date) + interval '1 day'")
         params["date_to"] = date_to
+    if cursor:
+        params["cursor_ts"], params["cursor_id"] = _decode_cursor(cursor)
+        where_clauses.append("(started_at, run_id) < (:cursor_ts, CAST(:cursor_id AS uuid))")
 
     where_sql = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
 
     query = f"""
         SELECT
             run_id,
-            MIN(created_at) AS started_at,
-            MAX(created_at) AS finished_at,
-            COUNT(*) FILTER (WHERE status = 'scraping_done') AS clients_ok,
-            COUNT(*) FILTER (WHERE status = 'scraping_failed') AS clients_failed,
-            BOOL_OR(status = 'transform_done') AS transform_ok,
-            MAX(CASE WHEN status = 'transform_done' THEN rows_count END) AS total_rows
-        FROM core.contact_report_extraction_logs
+            started_at,
+            finished_at,
+            clients_ok,
+            clients_failed,
+            clients_skipped,
+            transform_ok,
+            total_rows,
+            completed
+        FROM core.contact_report_run_summaries
         {where_sql}
-        GROUP BY run_id
-        ORDER BY MIN(created_at) DESC
+        ORDER BY started_at DESC, run_id DESC
+        LIMIT :limit
     """
 
-    with engine.connect() as conn:
-        rows = conn.execute(text(query), params).fetchall()
+    rows = await fetch_all(query, params)
 
-    return [
+    items = [
         {
             "run_id": str(r[0]),
             "started_at": r[1].isoformat() if r[1] else None,
             "finished_at": r[2].isoformat() if r[2] else None,
             "clients_ok": r[3],
             "clients_failed": r[4],
-            "transform_ok": r[5] or False,
-            "total_rows": r[6],
+            "clients_skipped": r[5],
+            "transform_ok": r[6] or False,
+            "total_rows": r[7],
+            "completed": r[8],
         }
         for r in rows
     ]
+    next_cursor = _encode_cursor(rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+# Columns selectable through ?fields= (id and created_at always come back: they form the cursor)
+LOG_FIELDS = ("id", "run_id", "client_id", "client", "status", "rows_count",
+              "error_message", "created_at", "details")
 
 
 @app.get("/api/runs/{run_id}/logs")
-def get_run_logs(run_id: str):
-    """Get all log entries for a specific run."""
-    query = """
-        SELECT id, run_id, client_id, client, status, rows_count,
-               error_message, created_at
+async def get_run_logs(
+    run_id: str,
+    request: Request,
+    limit: int = Query(500, ge=1, le=5000),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    status: list[str] | None = Query(None, description="Only these statuses (repeatable)"),
+    client: str | None = Query(None),
+    fields: str | None = Query(None, description="Comma-separated columns, e.g. id,status,client"),
+):
+    """Log entries for a run in chronological order, keyset-paginated on (created_at, id).
+
+    Pages of completed runs are served from logs_cache.
+    """
+    _ensure_cache_invalidation()
+    run_id = _run_id(run_id)
+    selected = _select_fields(fields)
+    key = f"{run_id}|{limit}|{cursor}|{sorted(status or [])}|{client}|{','.join(selected)}"
+    cached = logs_cache.get(key)
+    if cached is None:
+        generation = logs_cache.generation
+        # Checked before reading the rows, so a page is only cached if it was complete
+        completed = await _run_completed(run_id)
+        cached = encode(await _query_logs(run_id, limit, cursor, status, client, selected))
+        if completed:
+            logs_cache.put(key, *cached, generation)
+    return etag_response(request, *cached, "no-cache")
+
+
+async def _run_completed(run_id: str) -> bool:
+    rows = await fetch_all(
+        """
+        SELECT completed FROM core.contact_report_run_summaries
+        WHERE run_id = CAST(:run_id AS uuid)
+        """,
+        {"run_id": run_id},
+    )
+    return bool(rows and rows[0][0])
+
+
+async def _query_logs(
+    run_id: str,
+    limit: int,
+    cursor: str | None,
+    status: list[str] | None,
+    client: str | None,
+    selected: list[str],
+) -> dict:
+    where_clauses = ["run_id = CAST(:run_id AS uuid)"]
+    params = {"run_id": run_id, "limit": limit}
+
+    if status:
+        where_clauses.append("status = ANY(:status)")
+        params["status"] = status
+    if client:
+        where_clauses.append("client = :client")
+        params["client"] = client
+    if cursor:
+        params["cursor_ts"], params["cursor_id"] = _decode_cursor(cursor)
+        where_clauses.append("(created_at, id) > (:cursor_ts, CAST(:cursor_id AS bigint))")
+
+    query = f"""
+        SELECT {', '.join(selected)}
         FROM core.contact_report_extraction_logs
-        WHERE run_id = :run_id
+        WHERE {' AND '.join(where_clauses)}
         ORDER BY created_at ASC, id ASC
+        LIMIT :limit
     """
 
-    with engine.connect() as conn:
-        rows = conn.execute(text(query), {"run_id": run_id}).fetchall()
+    rows = await fetch_all(query, params, mappings=True)
 
-    return [
-        {
-            "id": r[0],
-            "run_id": str(r[1]),
-            "client_id": r[2],
-            "client": r[3],
-            "status": r[4],
-            "rows_count": r[5],
-            "error_message": r[6],
-            "created_at": r[7].isoformat() if r[7] else None,
-        }
-        for r in rows
-    ]
+    items = [{col: _serialize(row[col]) for col in selected} for row in rows]
+    next_cursor = (
+        _encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if len(rows) == limit else None
+    )
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@app.get("/api/runs/{run_id}/stream")
+async def stream_run_logs(
+    run_id: str,
+    request: Request,
+    cursor: str | None = Query(None, description="Only rows after this cursor"),
+):
+    """Server-Sent Events: the run's log rows, then new ones as they're written.
+
+    All viewers share one LISTEN connection (app.live). Rows arrive in commit
+    order and each event's id is the row id, so EventSource reconnects resume
+    via Last-Event-ID. The stream ends with an `end` event after pipeline_completed.
+    """
+    run_id = _run_id(run_id)
+    resume = request.headers.get("last-event-id") or cursor
+    last = _stream_cursor(resume) if resume else None
+
+    # Subscribe before the snapshot so nothing written in between is lost
+    queue = await broadcaster.subscribe(run_id)
+
+    async def events():
+        nonlocal last
+        try:
+            rows = await rows_after(run_id, last)
+            while True:
+                for row in rows:
+                    if last is not None and row["id"] <= last:
+                        continue  # already sent in the snapshot
+                    last = row["id"]
+                    data = json.dumps({col: _serialize(row[col]) for col in LOG_FIELDS})
+                    yield f"id: {last}\nevent: log\ndata: {data}\n\n"
+                    if row["status"] == "pipeline_completed":
+                        yield "event: end\ndata: {}\n\n"
+                        return
+
+                try:
+                    rows = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    rows = []
+                    yield ": keepalive\n\n"
+                    continue
+                if rows is None:
+                    return  # fell behind; the browser reconnects from its last id
+        finally:
+            broadcaster.unsubscribe(run_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/runs/{run_id}/profile")
+async def get_run_profile(
+    run_id: str,
+    recent: int = Query(7, ge=1, le=60, description="Earlier runs used as the baseline"),
+):
+    """Per-stage timings of a run (and per client), against p50/p95 of recent runs.
+
+    A stage is flagged as a regression when its p50 in this run exceeds the baseline p95.
+    """
+    params = {"run_id": _run_id(run_id), "recent": recent}
+
+    stage_rows = await fetch_all("""
+        SELECT
+            stage,
+            COUNT(*),
+            SUM(seconds),
+            percentile_cont(0.5) WITHIN GROUP (ORDER BY seconds),
+            percentile_cont(0.95) WITHIN GROUP (ORDER BY seconds),
+            MAX(seconds)
+        FROM core.contact_report_stage_metrics
+        WHERE run_id = CAST(:run_id AS uuid)
+        GROUP BY stage
+        ORDER BY SUM(seconds) DESC
+    """, params)
+
+    baseline_rows = await fetch_all("""
+        WITH recent AS (
+            SELECT run_id
+            FROM core.contact_report_run_summaries
+            WHERE run_id <> CAST(:run_id AS uuid)
+              AND started_at < COALESCE(
+                  (SELECT started_at FROM core.contact_report_run_summaries
+                   WHERE run_id = CAST(:run_id AS uuid)),
+                  now()
+              )
+            ORDER BY started_at DESC
+            LIMIT :recent
+        )
+        SELECT
+            m.stage,
+            COUNT(DISTINCT m.run_id),
+            percentile_cont(0.5) WITHIN GROUP (ORDER BY m.seconds),
+            percentile_cont(0.95) WITHIN GROUP (ORDER BY m.seconds)
+        FROM core.contact_report_stage_metrics m
+        JOIN recent r ON r.run_id = m.run_id
+        GROUP BY m.stage
+    """, params)
+    baseline = {r[0]: r for r in baseline_rows}
+
+    client_rows = await fetch_all("""
+        SELECT client, stage, SUM(seconds)
+        FROM core.contact_report_stage_metrics
+        WHERE run_id = CAST(:run_id AS uuid) AND client IS NOT NULL
+        GROUP BY client, stage
+        ORDER BY client, stage
+    """, params)
+
+    stages = []
+    for stage, count, total, p50, p95, max_seconds in stage_rows:
+        base = baseline.get(stage)
+        stages.append({
+            "stage": stage,
+            "count": count,
+            "total_seconds": round(total, 3),
+            "p50": round(p50, 3),
+            "p95": round(p95, 3),
+            "max": round(max_seconds, 3),
+            "baseline_runs": base[1] if base else 0,
+            "baseline_p50": round(base[2], 3) if base else None,
+            "baseline_p95": round(base[3], 3) if base else None,
+            "regression": bool(base and p50 > base[3]),
+        })
+
+    clients = {}
+    for client, stage, total in client_rows:
+        clients.setdefault(client, {})[stage] = round(total, 3)
+
+    return {"run_id": params["run_id"], "stages": stages, "clients": clients}
+
+
+def _select_fields(fields: str | None) -> list[str]:
+    if not fields:
+        return list(LOG_FIELDS)
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - set(LOG_FIELDS)
+    if unknown:
+        raise HTTPException(400, f"Campos desconocidos: {', '.join(sorted(unknown))}")
+    requested |= {"id", "created_at"}
+    return [f for f in LOG_FIELDS if f in requested]
+
+
+def _run_id(value: str) -> str:
+    """Canonical form of a run UUID (as the logger writes and NOTIFYs it); 400 if invalid."""
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        raise HTTPException(400, "run_id inválido")
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _encode_cursor(ts: datetime, key) -> str:
+    return base64.urlsafe_b64encode(f"{ts.isoformat()}|{key}".encode()).decode()
+
+
+def _stream_cursor(value: str) -> int:
+    """SSE cursor: the id of the last log row sent."""
+    if not value.isdigit():
+        raise HTTPException(400, "Cursor inválido")
+    return int(value)
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        ts, key = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(ts), key
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(400, "Cursor inválido")
 
 
 # Serve frontend static files (production build)
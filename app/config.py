@@ -8,6 +8,46 @@ load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 FERNET_KEY = os.getenv("FERNET_KEY")
 MAX_WORKERS = int(os.getenv("MAX_WORKERS", "4"))
+# Accounts with an open BrowserContext at once (above MAX_WORKERS so slots stay busy during politeness delays)
+ACCOUNT_CONCURRENCY = int(os.getenv("ACCOUNT_CONCURRENCY", "8"))
+LOAD_CHUNK_SIZE = int(os.getenv("LOAD_CHUNK_SIZE", "50000"))
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", "2"))
+LOAD_QUEUE_SIZE = int(os.getenv("LOAD_QUEUE_SIZE", "8"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "50"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "2"))
+API_DB_POOL_SIZE = int(os.getenv("API_DB_POOL_SIZE", "5"))
+API_DB_MAX_OVERFLOW = int(os.getenv("API_DB_MAX_OVERFLOW", "5"))
+API_DB_POOL_TIMEOUT = float(os.getenv("API_DB_POOL_TIMEOUT", "10"))
+# Cached responses for completed runs' logs (MB), and /api/runs freshness (seconds)
+API_CACHE_MAX_MB = int(os.getenv("API_CACHE_MAX_MB", "64"))
+API_RUNS_CACHE_TTL = float(os.getenv("API_RUNS_CACHE_TTL", "5"))
+# Sharded runs: >0 makes the cron enqueue this many shards for `python -m app.worker` processes
+PIPELINE_SHARDS = int(os.getenv("PIPELINE_SHARDS", "0"))
+SHARD_HEARTBEAT_SECONDS = float(os.getenv("SHARD_HEARTBEAT_SECONDS", "30"))
+SHARD_STALE_SECONDS = float(os.getenv("SHARD_STALE_SECONDS", "180"))
+SHARD_MAX_ATTEMPTS = int(os.getenv("SHARD_MAX_ATTEMPTS", "3"))
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "15"))
+# --resume refuses runs that logged an event more recently than this (still running elsewhere)
+RESUME_STALE_SECONDS = float(os.getenv("RESUME_STALE_SECONDS", "900"))
+# >0: each `python -m app.worker` serves its own /metrics on this port
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+# >0: `python -m app.main --scheduler` serves /metrics on this port (the unsharded pipeline runs there)
+SCHEDULER_METRICS_PORT = int(os.getenv("SCHEDULER_METRICS_PORT", "0"))
+# Columns of the unique index that lets the report view refresh CONCURRENTLY; must be
+# unique in the data (client,email is not: repeated emails are kept). Default: the row id
+MV_UNIQUE_COLUMNS = [c.strip() for c in os.getenv("MV_UNIQUE_COLUMNS", "id").split(",") if c.strip()]
 PROXY_URL = os.getenv("PROXY_URL", "")
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+SESSION_MAX_AGE_HOURS = int(os.getenv("SESSION_MAX_AGE_HOURS", "72"))
+# Distinct accounts from which credential preloading decrypts in a process pool
+CREDENTIAL_POOL_THRESHOLD = int(os.getenv("CREDENTIAL_POOL_THRESHOLD", "2000"))
+REPLY_BASE_URL = os.getenv("REPLY_BASE_URL", "https://run.reply.io").rstrip("/")
+# Direct CSV export endpoint (path with {team_id}); empty disables the HTTP fast path
+REPLY_EXPORT_PATH = os.getenv("REPLY_EXPORT_PATH", "")
 DOWNLOAD_DIR = Path(os.getenv("DOWNLOAD_DIR", "/tmp/reply_contact_report_extraction"))
-DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def ensure_download_dir() -> Path:
+    """Create DOWNLOAD_DIR. Called by the processes that scrape, not on import."""
+    DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    return DOWNLOAD_DIR
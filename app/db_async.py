@@ -0,0 +1,98 @@
+"""Async engine for the API's reads, with its own pool and latency stats.
+
+The pipeline keeps using the sync engine in app.db; dashboard requests get a
+separate, separately sized pool so they don't queue behind it (or on FastAPI's
+threadpool).
+"""
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import API_DB_MAX_OVERFLOW, API_DB_POOL_SIZE, API_DB_POOL_TIMEOUT, DATABASE_URL
+from app.metrics import DB_POOL_WAIT
+
+
+def _async_url(url: str) -> str:
+    """postgresql://… → postgresql+psycopg://… (psycopg 3, async-capable)."""
+    scheme, rest = url.split("://", 1)
+    return f"postgresql+psycopg://{rest}" if scheme.startswith("postgres") else url
+
+
+api_engine = create_async_engine(
+    _async_url(DATABASE_URL),
+    pool_size=API_DB_POOL_SIZE,
+    max_overflow=API_DB_MAX_OVERFLOW,
+    pool_timeout=API_DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+)
+
+
+class LatencyStats:
+    """Count/mean/max plus p50/p95 over the most recent samples (seconds)."""
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._recent.append(seconds)
+
+    def snapshot(self) -> dict:
+        recent = sorted(self._recent)
+
+        def pct(p):
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))] * 1000, 2) if recent else None
+
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 2) if self.count else None,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+pool_wait = LatencyStats()
+query_latency = LatencyStats()
+
+
+@asynccontextmanager
+async def api_connection():
+    """Checkout from the API pool, recording how long we waited for it."""
+    started = time.perf_counter()
+    async with api_engine.connect() as conn:
+        waited = time.perf_counter() - started
+        pool_wait.record(waited)
+        DB_POOL_WAIT.observe(waited)
+        yield conn
+
+
+async def fetch_all(query: str, params: dict | None = None, mappings: bool = False) -> list:
+    """Run a read query on the API pool and return all rows."""
+    async with api_connection() as conn:
+        started = time.perf_counter()
+        result = await conn.execute(text(query), params or {})
+        rows = result.mappings().fetchall() if mappings else result.fetchall()
+        query_latency.record(time.perf_counter() - started)
+    return rows
+
+
+def pool_status() -> dict:
+    """Current pool occupancy + checkout wait and query latency, for sizing the pool."""
+    pool = api_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "idle": pool.checkedin(),
+        "pool_wait": pool_wait.snapshot(),
+        "query": query_latency.snapshot(),
+    }
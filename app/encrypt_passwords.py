@@ -1,43 +1,86 @@
 """Encrypt all plain-text reply_password values in core.clientes.
 
 Usage:
-    python3 -m app.encrypt_passwords
+    python3 -m app.encrypt_passwords [--chunk-size N]
 
 Reads reply_password from core.clientes, encrypts any that aren't
 already Fernet-encrypted (don't start with 'gAAAAA'), and updates them in place.
+
+Works in chunks of rows ordered by id, each committed on its own with a single
+UPDATE ... FROM (VALUES ...). Safe to interrupt: a rerun only picks up the
+rows that are still plain text.
 """
+import sys
+import time
+
 from sqlalchemy import text
 
 from app.db import engine
 from app.utils.crypto import encrypt
 
+_PENDING = """
+    FROM core.clientes
+    WHERE reply_password IS NOT NULL AND reply_password != ''
+      AND reply_password NOT LIKE 'gAAAAA%'
+"""
+
 
-def encrypt_passwords():
-    with engine.begin() as conn:
-        rows = conn.execute(text(
-            "SELECT id, cliente, reply_password FROM core.clientes "
-            "WHERE reply_password IS NOT NULL AND reply_password != ''"
-        )).fetchall()
+def encrypt_passwords(chunk_size: int = 500):
+    with engine.connect() as conn:
+        total = conn.execute(text(f"SELECT COUNT(*) {_PENDING}")).scalar()
 
-        updated = 0
-        for row in rows:
-            client_id, name, password = row
+    if not total:
+        print("[encrypt] No hay contraseñas sin encriptar")
+        return
 
-            # Skip already encrypted values
-            if password.startswith("gAAAAA"):
-                print(f"  [{name}] ya encriptado, saltando")
-                continue
+    print(f"[encrypt] {total} contraseñas por encriptar (lotes de {chunk_size})")
+    started = time.perf_counter()
+    updated = 0
+    last_id = None
 
-            encrypted = encrypt(password)
-            conn.execute(
-                text("UPDATE core.clientes SET reply_password = :enc WHERE id = :id"),
-                {"enc": encrypted, "id": client_id},
+    while True:
+        with engine.begin() as conn:
+            params = {"limit": chunk_size}
+            after = ""
+            if last_id is not None:
+                after = "AND id > :last_id"
+                params["last_id"] = last_id
+            rows = conn.execute(
+                text(f"SELECT id, reply_password {_PENDING} {after} ORDER BY id LIMIT :limit"),
+                params,
+            ).fetchall()
+            if not rows:
+                break
+
+            values = []
+            update_params = {}
+            for i, (client_id, password) in enumerate(rows):
+                values.append(f"(:id_{i}, :enc_{i})")
+                update_params[f"id_{i}"] = client_id
+                update_params[f"enc_{i}"] = encrypt(password)
+
+            # The NOT LIKE guard skips rows encrypted concurrently by another run
+            result = conn.execute(
+                text(f"""
+                    UPDATE core.clientes c
+                    SET reply_password = v.enc
+                    FROM (VALUES {', '.join(values)}) AS v(id, enc)
+                    WHERE c.id = v.id
+                      AND c.reply_password NOT LIKE 'gAAAAA%'
+                """),
+                update_params,
             )
-            print(f"  [{name}] encriptado OK")
-            updated += 1
+
+        updated += result.rowcount
+        last_id = rows[-1][0]
+        elapsed = time.perf_counter() - started
+        print(f"  [encrypt] {updated}/{total} ({updated / total:.0%}) en {elapsed:.1f}s")
 
     print(f"\n[encrypt] {updated} contraseñas encriptadas")
 
 
 if __name__ == "__main__":
-    encrypt_passwords()
+    chunk_size = 500
+    if "--chunk-size" in sys.argv:
+        chunk_size = int(sys.argv[sys.argv.index("--chunk-size") + 1])
+    encrypt_passwords(chunk_size)
@@ -0,0 +1,145 @@
+"""Live log fan-out: one LISTEN connection → every SSE viewer of a run.
+
+The logger NOTIFYs NOTIFY_CHANNEL with the run_id after each flush
+(from whichever process runs the pipeline). For each notified run with
+viewers, new rows are read once and pushed to all of their queues.
+"""
+import asyncio
+import json
+
+import psycopg
+
+from app.config import DATABASE_URL
+from app.db_async import fetch_all
+from app.pipeline.logger import NOTIFY_CHANNEL
+
+# Paged on id, not created_at: created_at is stamped when the event happens
+# and a row can commit after newer ones (flush delay, other shard processes).
+# Flushes hold an advisory lock, so ids do increase in commit order.
+_NEW_ROWS = """
+    SELECT id, run_id, client_id, client, status, rows_count, error_message, created_at, details
+    FROM core.contact_report_extraction_logs
+    WHERE run_id = CAST(:run_id AS uuid) AND id > :cursor
+    ORDER BY id ASC
+"""
+
+_LATEST_ID = """
+    SELECT MAX(id) FROM core.contact_report_extraction_logs
+    WHERE run_id = CAST(:run_id AS uuid)
+"""
+
+
+async def rows_after(run_id: str, cursor: int | None) -> list:
+    """Log rows of `run_id` committed after the row with id `cursor`, in commit order."""
+    return await fetch_all(_NEW_ROWS, {"run_id": run_id, "cursor": cursor or 0}, mappings=True)
+
+
+class LogBroadcaster:
+    """Single upstream subscription shared by all viewers, started lazily."""
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        self._cursors: dict[str, int | None] = {}  # run_id → id last fetched
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._listeners: list = []
+        self._task: asyncio.Task | None = None
+
+    def add_listener(self, callback):
+        """Call `callback(run_id)` on every notification, `callback(None)` after (re)connecting."""
+        self._listeners.append(callback)
+        self._ensure_listening()
+
+    async def subscribe(self, run_id: str) -> asyncio.Queue:
+        """Queue that receives lists of new log rows (mappings) for `run_id`.
+
+        A `None` item means the viewer fell behind and should reconnect.
+        """
+        self._ensure_listening()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if run_id not in self._subscribers:
+            self._subscribers[run_id] = viewers = set()
+            self._locks[run_id] = lock = asyncio.Lock()
+            try:
+                async with lock:
+                    latest = await fetch_all(_LATEST_ID, {"run_id": run_id})
+                    self._cursors[run_id] = latest[0][0] if latest else None
+            except BaseException:
+                if viewers:
+                    # Viewers that joined meanwhile get every row (they skip what they've sent)
+                    self._cursors[run_id] = None
+                else:
+                    self._subscribers.pop(run_id, None)
+                    self._locks.pop(run_id, None)
+                raise
+        self._subscribers[run_id].add(queue)
+        return queue
+
+    def unsubscribe(self, run_id: str, queue: asyncio.Queue):
+        viewers = self._subscribers.get(run_id)
+        if viewers is None:
+            return
+        viewers.discard(queue)
+        if not viewers:
+            del self._subscribers[run_id]
+            self._cursors.pop(run_id, None)
+            self._locks.pop(run_id, None)
+
+    def viewer_count(self) -> int:
+        return sum(len(v) for v in self._subscribers.values())
+
+    def _ensure_listening(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            try:
+                conn = await psycopg.AsyncConnection.connect(DATABASE_URL, autocommit=True)
+                async with conn:
+                    await conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    print("[live] Escuchando eventos de logs")
+                    self._notify_listeners(None)  # notifications may have been missed
+                    # Catch up on anything missed while (re)connecting
+                    for run_id in list(self._subscribers):
+                        await self._publish(run_id)
+                    async for notify in conn.notifies():
+                        run_id = json.loads(notify.payload).get("run_id")
+                        self._notify_listeners(run_id)
+                        if run_id in self._subscribers:
+                            await self._publish(run_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[live] Conexión LISTEN perdida ({e}), reintentando en 5s")
+                await asyncio.sleep(5)
+
+    def _notify_listeners(self, run_id: str | None):
+        for callback in self._listeners:
+            try:
+                callback(run_id)
+            except Exception as e:
+                print(f"[live] Error en listener: {e}")
+
+    async def _publish(self, run_id: str):
+        lock = self._locks.get(run_id)
+        if lock is None:
+            return
+        async with lock:
+            rows = await rows_after(run_id, self._cursors.get(run_id))
+            if not rows:
+                return
+            if run_id in self._cursors:
+                self._cursors[run_id] = rows[-1]["id"]
+
+            for queue in list(self._subscribers.get(run_id, ())):
+                try:
+                    queue.put_nowait(rows)
+                except asyncio.QueueFull:
+                    # Slow viewer: tell it to reconnect (it resumes from Last-Event-ID)
+                    self.unsubscribe(run_id, queue)
+                    queue.get_nowait()
+                    queue.put_nowait(None)
+
+
+broadcaster = LogBroadcaster()
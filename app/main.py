@@ -1,43 +1,127 @@
-"""Entry point: APScheduler cron + API server + manual trigger."""
+"""Entry point: APScheduler cron + API server + manual trigger.
+
+Each process type only imports what it runs, so the API and the scheduler
+start without loading pandas, Playwright or the scraper:
+    python3 -m app.main               # scheduler + API (single container)
+    python3 -m app.main --api         # API only
+    python3 -m app.main --scheduler   # cron only
+    python3 -m app.worker             # shard worker (same as --worker)
+"""
 import asyncio
 import sys
-from contextlib import asynccontextmanager
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
+from app.config import PIPELINE_SHARDS, SCHEDULER_METRICS_PORT
+
+
+async def daily_job():
+    """Cron job: enqueue shards for the workers, or run the whole pipeline in this process."""
+    if PIPELINE_SHARDS > 0:
+        from app.worker.shards import create_sharded_run
+        await asyncio.to_thread(create_sharded_run, PIPELINE_SHARDS)
+        return
+    from app.pipeline.extract import run_pipeline
+    await run_pipeline()
+
+
+def create_scheduler():
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from apscheduler.triggers.cron import CronTrigger
 
-from app.pipeline.extract import run_pipeline
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(
+        daily_job,
+        trigger=CronTrigger(hour=0, minute=0, timezone="America/Lima"),
+        id="daily_extraction",
+        name="Extracción diaria de contactos Reply.io",
+        replace_existing=True,
+    )
+    return scheduler
+
+
+async def run_scheduler():
+    if SCHEDULER_METRICS_PORT:
+        from prometheus_client import start_http_server
+        start_http_server(SCHEDULER_METRICS_PORT)
+        print(f"[main] Métricas en http://0.0.0.0:{SCHEDULER_METRICS_PORT}/metrics")
+    scheduler = create_scheduler()
+    scheduler.start()
+    print("[main] Scheduler iniciado — cron a las 00:00 America/Lima (05:00 UTC)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        scheduler.shutdown()
+
+
+def _pipeline_process():
+    """This process runs the pipeline: flush buffered log events on exit and SIGTERM."""
+    from app.pipeline.logger import install_exit_handlers
+    install_exit_handlers()
 
 
 def main():
     # Manual trigger: python3 -m app.main --now
     if "--now" in sys.argv:
+        from app.pipeline.extract import run_pipeline
         print("[main] Ejecutando pipeline manualmente...")
+        _pipeline_process()
         asyncio.run(run_pipeline())
         return
 
-    # API only (dev): python3 -m app.main --api
+    # Resume an interrupted run: python3 -m app.main --resume <run_id> [--force]
+    if "--resume" in sys.argv:
+        args = sys.argv[sys.argv.index("--resume") + 1:]
+        if not args or args[0].startswith("--"):
+            print("[main] Uso: python3 -m app.main --resume <run_id> [--force]")
+            sys.exit(2)
+        from app.pipeline.resume import resume_pipeline
+        _pipeline_process()
+        print(f"[main] Reanudando pipeline {args[0]}...")
+        asyncio.run(resume_pipeline(args[0], force="--force" in sys.argv))
+        return
+
+    # Sharded run: python3 -m app.main --coordinator [--shards N], then workers pick it up
+    if "--coordinator" in sys.argv:
+        shards = PIPELINE_SHARDS or 4
+        if "--shards" in sys.argv:
+            args = sys.argv[sys.argv.index("--shards") + 1:]
+            if not args or not args[0].isdigit() or int(args[0]) < 1:
+                print("[main] Uso: python3 -m app.main --coordinator [--shards N]  (N entero >= 1)")
+                sys.exit(2)
+            shards = int(args[0])
+        from app.worker.shards import create_sharded_run
+        _pipeline_process()
+        create_sharded_run(shards)
+        return
+
+    # Shard worker: python3 -m app.main --worker [--once] (same as python3 -m app.worker)
+    if "--worker" in sys.argv:
+        from app.worker.runner import run_worker
+        _pipeline_process()
+        asyncio.run(run_worker(once="--once" in sys.argv))
+        return
+
+    # Scheduler only (API served elsewhere): python3 -m app.main --scheduler
+    if "--scheduler" in sys.argv:
+        _pipeline_process()
+        asyncio.run(run_scheduler())
+        return
+
+    import uvicorn
+    from app.api import app
+
+    # API only: python3 -m app.main --api
     if "--api" in sys.argv:
-        import uvicorn
-        from app.api import app
         print("[main] Iniciando API server en http://0.0.0.0:8001")
         uvicorn.run(app, host="0.0.0.0", port=8001)
         return
 
-    # Production: scheduler + API together
-    import uvicorn
-    from app.api import app
+    # Production: scheduler + API together (uvicorn then swaps in its own SIGTERM handler)
+    _pipeline_process()
+    from contextlib import asynccontextmanager
 
     @asynccontextmanager
     async def lifespan(_app):
-        scheduler = AsyncIOScheduler()
-        scheduler.add_job(
-            run_pipeline,
-            trigger=CronTrigger(hour=0, minute=0, timezone="America/Lima"),
-            id="daily_extraction",
-            name="Extracción diaria de contactos Reply.io",
-            replace_existing=True,
-        )
+        scheduler = create_scheduler()
         scheduler.start()
         print("[main] Scheduler iniciado — cron a las 00:00 America/Lima (05:00 UTC)")
         yield
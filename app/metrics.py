@@ -0,0 +1,48 @@
+"""Prometheus collectors for the pipeline and the API, served at GET /metrics.
+
+Updating a collector is an in-memory increment (no I/O), cheap enough for
+the hot paths. The API serves the collectors of its own process, which
+include the pipeline only when the scheduler runs alongside it
+(`python -m app.main`). Processes that run the pipeline on their own expose
+theirs on a port: WORKER_METRICS_PORT for shard workers,
+SCHEDULER_METRICS_PORT for `python -m app.main --scheduler`.
+"""
+from prometheus_client import Counter, Histogram
+
+SCRAPE_SECONDS = Histogram(
+    "contact_report_scrape_seconds",
+    "Wall time to export one workspace's CSV (HTTP or browser)",
+    buckets=(5, 10, 20, 30, 45, 60, 90, 120, 180, 300, 600),
+)
+ROWS_LOADED = Counter(
+    "contact_report_rows_loaded_total",
+    "Rows COPYed into staging.contacts_report",
+)
+SESSIONS = Counter(
+    "contact_report_sessions_total",
+    "Workspace exports by how the session was obtained",
+    ["outcome"],  # login | cookie_reuse
+)
+RETRIES = Counter(
+    "contact_report_retries_total",
+    "Retry attempts by error class",
+    ["error_class"],
+)
+BROWSER_LAUNCHES = Counter(
+    "contact_report_browser_launches_total",
+    "Chromium processes launched by BrowserPool (including crash replacements)",
+)
+DB_POOL_WAIT = Histogram(
+    "contact_report_api_db_pool_wait_seconds",
+    "Time waiting for a connection from the API pool",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+API_REQUEST_SECONDS = Histogram(
+    "contact_report_api_request_seconds",
+    "API latency until the response starts, per route template",
+    ["method", "route", "status"],
+)
+
+
+def observe_session(login_status: str):
+    SESSIONS.labels("login" if login_status == "login_done" else "cookie_reuse").inc()
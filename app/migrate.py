@@ -1,8 +1,16 @@
-"""Create schemas and tables for the ELT pipeline."""
+"""Create schemas and tables for the ELT pipeline.
+
+    python3 -m app.migrate               # idempotent, safe on every deploy
+    python3 -m app.migrate --partition   # one-off: partition core.contacts_report by client
+"""
+import sys
+
 from sqlalchemy import text
 
+from app.config import MV_UNIQUE_COLUMNS
 from app.db import engine
 from app.models import Base
+from app.pipeline.partitions import MATVIEW, partition_contacts_report
 
 
 def run_migrations():
@@ -43,10 +51,199 @@ def run_migrations():
             )
         """))
 
+        # core.contact_report_extraction_logs — one row per pipeline event
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS core.contact_report_extraction_logs (
+                id BIGSERIAL PRIMARY KEY,
+                run_id UUID NOT NULL,
+                client_id INTEGER,
+                client TEXT,
+                status TEXT NOT NULL,
+                rows_count INTEGER,
+                error_message TEXT,
+                created_at TIMESTAMPTZ DEFAULT now()
+            )
+        """))
+        conn.execute(text(
+            "ALTER TABLE core.contact_report_extraction_logs "
+            "ADD COLUMN IF NOT EXISTS details JSONB"
+        ))
+        # DB clock at flush (created_at is stamped by the pipeline host when the event happens)
+        conn.execute(text(
+            "ALTER TABLE core.contact_report_extraction_logs "
+            "ADD COLUMN IF NOT EXISTS logged_at TIMESTAMPTZ DEFAULT now()"
+        ))
+        # Keyset pagination of /api/runs/{run_id}/logs, optionally filtered by status or client
+        for name, cols in [
+            ("contact_report_logs_run_keyset_idx", "run_id, created_at, id"),
+            ("contact_report_logs_run_status_idx", "run_id, status, created_at, id"),
+            ("contact_report_logs_run_client_idx", "run_id, client, created_at, id"),
+            # Live stream (app.live) pages on id, which follows commit order
+            ("contact_report_logs_run_id_idx", "run_id, id"),
+        ]:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {name} ON core.contact_report_extraction_logs ({cols})"
+            ))
+
+        # One row per run, maintained by the logger (GET /api/runs reads it)
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS core.contact_report_run_summaries (
+                run_id UUID PRIMARY KEY,
+                started_at TIMESTAMPTZ,
+                finished_at TIMESTAMPTZ,
+                clients_ok INTEGER NOT NULL DEFAULT 0,
+                clients_failed INTEGER NOT NULL DEFAULT 0,
+                clients_skipped INTEGER NOT NULL DEFAULT 0,
+                transform_ok BOOLEAN NOT NULL DEFAULT false,
+                total_rows INTEGER,
+                completed BOOLEAN NOT NULL DEFAULT false,
+                updated_at TIMESTAMPTZ DEFAULT now()
+            )
+        """))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS contact_report_run_summaries_keyset_idx "
+            "ON core.contact_report_run_summaries (started_at DESC, run_id DESC)"
+        ))
+
+        # Last loaded export per client, to skip reloading unchanged CSVs
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS core.contact_report_export_hashes (
+                client TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                rows_count INTEGER,
+                loaded_at TIMESTAMPTZ DEFAULT now(),
+                synced BOOLEAN NOT NULL DEFAULT false
+            )
+        """))
+
+        # Stage timings per run/client (app.pipeline.profiler)
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS core.contact_report_stage_metrics (
+                id BIGSERIAL PRIMARY KEY,
+                run_id UUID NOT NULL,
+                client_id INTEGER,
+                client TEXT,
+                stage TEXT NOT NULL,
+                seconds DOUBLE PRECISION NOT NULL,
+                created_at TIMESTAMPTZ DEFAULT now()
+            )
+        """))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS contact_report_stage_metrics_run_idx "
+            "ON core.contact_report_stage_metrics (run_id, stage)"
+        ))
+
+        # Sharded runs: one row per run, one per shard (claimed by app.worker processes)
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS core.contact_report_sharded_runs (
+                run_id UUID PRIMARY KEY,
+                shards INTEGER NOT NULL,
+                created_at TIMESTAMPTZ DEFAULT now(),
+                finalized_at TIMESTAMPTZ
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS core.contact_report_run_shards (
+                run_id UUID NOT NULL REFERENCES core.contact_report_sharded_runs (run_id),
+                shard_no INTEGER NOT NULL,
+                emails TEXT[] NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker_id TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                heartbeat_at TIMESTAMPTZ,
+                loaded_clients TEXT[] NOT NULL DEFAULT '{}',
+                error_message TEXT,
+                created_at TIMESTAMPTZ DEFAULT now(),
+                updated_at TIMESTAMPTZ DEFAULT now(),
+                PRIMARY KEY (run_id, shard_no)
+            )
+        """))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS contact_report_run_shards_open_idx "
+            "ON core.contact_report_run_shards (created_at, shard_no) "
+            "WHERE status IN ('pending', 'running')"
+        ))
+
+        # Report view freshness: transforms bump version, successful refreshes catch up.
+        # core_rows: size of core.contacts_report, moved by each transform's delta
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS core.contact_report_view_state (
+                matview TEXT PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0,
+                refreshed_version BIGINT NOT NULL DEFAULT 0,
+                refreshed_at TIMESTAMPTZ,
+                core_rows BIGINT
+            )
+        """))
+
+        # Encrypted Playwright storage_state per Reply.io login (core.clientes.reply_mail)
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS core.reply_sessions (
+                email TEXT PRIMARY KEY,
+                storage_state_encrypted TEXT NOT NULL,
+                expires_at TIMESTAMPTZ NOT NULL,
+                updated_at TIMESTAMPTZ DEFAULT now()
+            )
+        """))
+
+        # Incremental transform matches core rows on (client, email). The table
+        # itself is created outside this repo, so it may not exist yet
+        if conn.execute(text("SELECT to_regclass('core.contacts_report') IS NOT NULL")).scalar():
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS contacts_report_client_email_idx "
+                "ON core.contacts_report (client, email)"
+            ))
+            # Row id, the one key the data guarantees unique (an email may repeat
+            # within a client). A sequence default rather than an identity: LIKE
+            # ... INCLUDING DEFAULTS carries it to partitions and the partitioned
+            # rebuild. Adding it rewrites the table once.
+            conn.execute(text("CREATE SEQUENCE IF NOT EXISTS core.contacts_report_id_seq"))
+            conn.execute(text(
+                "ALTER TABLE core.contacts_report "
+                "ADD COLUMN IF NOT EXISTS id BIGINT DEFAULT nextval('core.contacts_report_id_seq')"
+            ))
+        else:
+            print("[migrate] core.contacts_report no existe, índice (client, email) e id omitidos")
+
     # elt_accounts, elt_clients, elt_runs (public schema, via SQLAlchemy ORM)
     Base.metadata.create_all(engine)
+    ensure_report_view_unique_index()
     print("[migrate] Tablas creadas exitosamente")
 
 
+def ensure_report_view_unique_index():
+    """Unique index on the report view over MV_UNIQUE_COLUMNS, required by REFRESH ... CONCURRENTLY.
+
+    Separate transaction: if the view is missing, doesn't select those columns
+    (add core.contacts_report.id to its definition) or has duplicate keys, the
+    migration still succeeds and the transform keeps refreshing without CONCURRENTLY.
+    """
+    columns = ", ".join(MV_UNIQUE_COLUMNS)
+    try:
+        with engine.begin() as conn:
+            if not conn.execute(text("SELECT to_regclass(:mv) IS NOT NULL"), {"mv": MATVIEW}).scalar():
+                print(f"[migrate] {MATVIEW} no existe, índice único omitido")
+                return
+            missing = sorted(set(MV_UNIQUE_COLUMNS) - {r[0] for r in conn.execute(
+                text("""
+                    SELECT attname FROM pg_attribute
+                    WHERE attrelid = CAST(:mv AS regclass) AND attnum > 0 AND NOT attisdropped
+                """),
+                {"mv": MATVIEW},
+            )})
+            if missing:
+                print(f"[migrate] {MATVIEW} no expone {', '.join(missing)}, índice único omitido")
+                return
+            conn.execute(text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS contacts_report_with_periods_mv_unique_idx "
+                f"ON {MATVIEW} ({columns})"
+            ))
+    except Exception as e:
+        print(f"[migrate] No se pudo crear el índice único de {MATVIEW} ({columns}): {e}")
+
+
 if __name__ == "__main__":
     run_migrations()
+    if "--partition" in sys.argv:
+        partition_contacts_report()
+        ensure_report_view_unique_index()
@@ -0,0 +1,28 @@
+"""Clients to extract, from core.clientes (no scraping dependencies, safe for light processes)."""
+from sqlalchemy import text
+
+from app.db import engine
+
+
+def get_active_clients() -> list[dict]:
+    """Fetch clients from core.clientes that have credentials and team_id."""
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT id, cliente, reply_mail, reply_password, team_id "
+            "FROM core.clientes "
+            "WHERE reply_mail IS NOT NULL "
+            "AND reply_password IS NOT NULL "
+            "AND team_id IS NOT NULL "
+            "AND status != 'Archived'"
+        )).fetchall()
+
+    return [
+        {
+            "id": r[0],
+            "name": r[1],
+            "email": r[2],
+            "password_encrypted": r[3],
+            "team_id": r[4],
+        }
+        for r in rows
+    ]
@@ -0,0 +1,93 @@
+"""Per-run credential store: each account's password is decrypted once, then zeroized.
+
+Secrets are held as bytearrays so they can be overwritten when released.
+This is best effort: the str handed to Playwright is an immutable copy that
+Python frees on its own schedule.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from app.config import CREDENTIAL_POOL_THRESHOLD
+from app.utils.crypto import decrypt_bytes
+
+
+class CredentialError(Exception):
+    """An account's password can't be obtained (bad ciphertext, wrong key, missing)."""
+
+
+def _decrypt_chunk(ciphertexts: list[str]) -> list[tuple[bytes | None, str | None]]:
+    """Worker: (plaintext, None) or (None, error) per ciphertext."""
+    results = []
+    for ciphertext in ciphertexts:
+        try:
+            results.append((decrypt_bytes(ciphertext), None))
+        except Exception as e:
+            results.append((None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+class CredentialStore:
+    """Decrypted passwords keyed by account email. Call release_all() when the run ends."""
+
+    def __init__(self):
+        self._secrets: dict[str, bytearray] = {}
+        self._ciphertexts: dict[str, str] = {}
+        self._errors: dict[str, str] = {}
+
+    def preload(self, clients: list[dict], processes: int | None = None):
+        """Decrypt every distinct account in `clients` up front.
+
+        Large rosters are split across a process pool (Fernet is CPU-bound);
+        below CREDENTIAL_POOL_THRESHOLD accounts, process startup would cost
+        more than it saves, so they're decrypted inline.
+        """
+        for client in clients:
+            self._ciphertexts.setdefault(client["email"], client["password_encrypted"])
+
+        pending = [email for email in self._ciphertexts if email not in self._secrets]
+        ciphertexts = [self._ciphertexts[email] for email in pending]
+
+        if len(pending) >= CREDENTIAL_POOL_THRESHOLD:
+            workers = processes or 4
+            size = -(-len(pending) // (workers * 4))
+            chunks = [ciphertexts[i:i + size] for i in range(0, len(ciphertexts), size)]
+            # spawn, not fork: this runs in a worker thread of a process with the
+            # log flusher, Playwright and DB driver threads alive
+            spawn = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=spawn) as executor:
+                results = [r for chunk in executor.map(_decrypt_chunk, chunks) for r in chunk]
+        else:
+            results = _decrypt_chunk(ciphertexts)
+
+        for email, (plaintext, error) in zip(pending, results):
+            if error is not None:
+                self._errors[email] = error
+                print(f"[credentials] No se pudo desencriptar {email}: {error}")
+            else:
+                self._secrets[email] = bytearray(plaintext)
+
+        print(f"[credentials] {len(self._secrets)} cuentas listas, {len(self._errors)} con error")
+
+    def password(self, email: str) -> str:
+        """Plaintext password for `email` (decrypted now if it wasn't preloaded)."""
+        secret = self._secrets.get(email)
+        if secret is None:
+            if email in self._errors:
+                raise CredentialError(f"contraseña inválida para {email}: {self._errors[email]}")
+            if email not in self._ciphertexts:
+                raise CredentialError(f"cuenta sin credenciales: {email}")
+            try:
+                secret = self._secrets[email] = bytearray(decrypt_bytes(self._ciphertexts[email]))
+            except Exception as e:
+                raise CredentialError(f"contraseña inválida para {email}: {type(e).__name__}: {e}") from e
+        return secret.decode()
+
+    def release(self, email: str):
+        """Zero and forget `email`'s secret; a later password() decrypts again."""
+        secret = self._secrets.pop(email, None)
+        if secret is not None:
+            secret[:] = bytes(len(secret))
+
+    def release_all(self):
+        for email in list(self._secrets):
+            self.release(email)
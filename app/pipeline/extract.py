@@ -1,42 +1,29 @@
 """Orchestrate extraction from core.clientes with parallelism."""
 import asyncio
+import time
 from collections import defaultdict
 from datetime import datetime
 
-from sqlalchemy import text
-
-from app.config import DOWNLOAD_DIR, MAX_WORKERS, PROXY_URL
-from app.db import engine
-from app.scraper.reply_io import download_contacts_csv
-from app.pipeline.load import load_csv_to_staging
+from app.config import (
+    ACCOUNT_CONCURRENCY, DOWNLOAD_DIR, LOAD_QUEUE_SIZE, LOAD_WORKERS, MAX_WORKERS, PROXY_URL,
+    ensure_download_dir,
+)
+from app.metrics import ROWS_LOADED, SCRAPE_SECONDS, observe_session
+from app.scraper.browser_pool import BrowserPool
+from app.scraper.export import close_context, export_workspace
+from app.scraper.http_export import HttpExporter
+from app.pipeline.clients import get_active_clients
+from app.pipeline.credentials import CredentialError, CredentialStore
+from app.pipeline.load import stage_export
+from app.pipeline.retry import RetryScheduler, failure
 from app.pipeline.transform import transform_staging_to_core
-from app.pipeline.logger import new_run_id, log_event
-from app.utils.crypto import decrypt
-from app.utils.rate_limit import random_delay, backoff_delay
-
-
-def _get_active_clients() -> list[dict]:
-    """Fetch clients from core.clientes that have credentials and team_id."""
-    with engine.connect() as conn:
-        rows = conn.execute(text(
-            "SELECT id, cliente, reply_mail, reply_password, team_id "
-            "FROM core.clientes "
-            "WHERE reply_mail IS NOT NULL "
-            "AND reply_password IS NOT NULL "
-            "AND team_id IS NOT NULL "
-            "AND status != 'Archived'"
-        )).fetchall()
-
-    return [
-        {
-            "id": r[0],
-            "name": r[1],
-            "email": r[2],
-            "password_encrypted": r[3],
-            "team_id": r[4],
-        }
-        for r in rows
-    ]
+from app.pipeline.logger import flush_events, new_run_id, log_event
+from app.pipeline.profiler import profile_scope, record, record_timings
+from app.pipeline.scheduler import (
+    ScrapeSlots, account_remaining_seconds, order_longest_first, workspace_estimates,
+)
+from app.pipeline.session_cache import invalidate_session, load_session, save_session
+from app.utils.rate_limit import random_delay
 
 
 async def run_pipeline():
@@ -45,13 +32,33 @@ async def run_pipeline():
     log_event(run_id, "pipeline_started")
     print(f"[extract] Pipeline iniciado (run_id={run_id})")
 
-    clients = _get_active_clients()
+    clients = await asyncio.to_thread(get_active_clients)
 
     if not clients:
         print("[extract] No hay clientes con credenciales y team_id")
         log_event(run_id, "pipeline_completed", rows_count=0)
+        await asyncio.to_thread(flush_events)
         return
 
+    loaded_clients = await scrape_clients(run_id, clients)
+    await asyncio.to_thread(finish_run, run_id, loaded_clients)
+    await asyncio.to_thread(flush_events)
+    print("[extract] Pipeline completado")
+
+
+async def scrape_clients(run_id: str, clients: list[dict]) -> list[str]:
+    """Extract and stage `clients` (retries included) as part of `run_id`.
+
+    Returns the names whose staging data was replaced, i.e. what the transform needs.
+    Used for a whole run by run_pipeline and for one shard by app.worker.
+    """
+    with profile_scope(run_id=run_id):
+        return await _scrape_clients(run_id, clients)
+
+
+async def _scrape_clients(run_id: str, clients: list[dict]) -> list[str]:
+    ensure_download_dir()
+
     # Group clients by email (same login = same browser session)
     accounts = defaultdict(list)
     for client in clients:
@@ -59,122 +66,250 @@ async def run_pipeline():
 
     print(f"[extract] {len(accounts)} cuentas, {len(clients)} clientes")
 
-    semaphore = asyncio.Semaphore(MAX_WORKERS)
-    failed_clients = []
-
-    async def process_account(email: str, account_clients: list[dict]):
-        async with semaphore:
-            password = decrypt(account_clients[0]["password_encrypted"])
-            cookies = None
-
-            print(f"[extract] Procesando cuenta: {email} ({len(account_clients)} workspaces)")
-
+    # One decrypt per account for the whole run (retries included)
+    credentials = CredentialStore()
+    await asyncio.to_thread(credentials.preload, clients)
+
+    # Longest accounts start first; MAX_WORKERS workspaces scrape at once
+    estimates = await asyncio.to_thread(workspace_estimates, [c["id"] for c in clients])
+    ordered_accounts = order_longest_first(accounts, estimates)
+    slots = ScrapeSlots(MAX_WORKERS)
+    # Bounds the accounts in progress, hence the BrowserContexts open at once
+    open_accounts = asyncio.Semaphore(max(1, ACCOUNT_CONCURRENCY))
+    failures = []  # retry.failure() records, for the retry phase
+    loaded_clients = []  # names whose staging data was replaced in this run
+
+    # Scrapers hand finished CSVs to the load workers through a bounded queue,
+    # so pandas/DB work runs in threads and never blocks the event loop
+    load_queue = asyncio.Queue(maxsize=LOAD_QUEUE_SIZE)
+    stages = {
+        "scrape": {"items": 0, "seconds": 0.0},
+        "load": {"items": 0, "rows": 0, "seconds": 0.0},
+    }
+
+    async def load_worker():
+        while True:
+            item = await load_queue.get()
+            if item is None:
+                load_queue.task_done()
+                return
+
+            client, csv_path, timings = item
+            cid = client["id"]
+            cname = client["name"]
+            started = time.perf_counter()
+            try:
+                with profile_scope(client_id=cid, client=cname):
+                    rows, loaded = await asyncio.to_thread(stage_export, csv_path, cname)
+                if loaded:
+                    loaded_clients.append(cname)
+                    ROWS_LOADED.inc(rows)
+                stages["load"]["items"] += 1
+                stages["load"]["rows"] += rows
+
+                # Log successful scraping + load (or unchanged export)
+                status = "scraping_done" if loaded else "load_skipped"
+                log_event(run_id, status, client_id=cid, client=cname, rows_count=rows,
+                          details={"ui_seconds": timings})
+            except Exception as e:
+                print(f"[extract] Error cargando {cname}: {e}")
+                failures.append(failure(client, e, "load", csv_path))
+                log_event(run_id, "scraping_failed", client_id=cid, client=cname, error_message=str(e),
+                          details={"error_class": failures[-1]["error_class"]})
+            finally:
+                stages["load"]["seconds"] += time.perf_counter() - started
+                load_queue.task_done()
+
+    async def process_account(
+        pool: BrowserPool, exporter: HttpExporter, email: str, account_clients: list[dict],
+    ):
+        try:
+            password = credentials.password(email)
+        except CredentialError as e:
+            # Only this account's workspaces fail; the rest of the run goes on
+            print(f"[extract] {email}: {e}")
+            for client in account_clients:
+                failures.append(failure(client, e, "scrape"))
+                log_event(run_id, "scraping_failed", client_id=client["id"], client=client["name"],
+                          error_message=str(e), details={"error_class": failures[-1]["error_class"]})
+            return
+
+        # Persisted from a previous run, if still valid
+        cookies = await asyncio.to_thread(load_session, email)
+        cached_session = cookies is not None
+        session_confirmed = False
+        context = None  # one BrowserContext per account, reused across workspaces
+
+        print(f"[extract] Procesando cuenta: {email} ({len(account_clients)} workspaces)")
+
+        try:
             for i, client in enumerate(account_clients):
                 cid = client["id"]
                 cname = client["name"]
-
-                # Log scraping start
-                log_event(run_id, "scraping", client_id=cid, client=cname)
-
-                started_at = datetime.now()
-                try:
-                    download_dir = DOWNLOAD_DIR / cname.lower().replace(" ", "_")
-
-                    # Log login attempt
-                    log_event(run_id, "login_started", client_id=cid, client=cname)
-
-                    csv_path, updated_cookies, login_status = await download_contacts_csv(
-                        email=email,
-                        password=password,
-                        team_id=client["team_id"],
-                        download_dir=download_dir,
-                        cookies_json=cookies,
-                        headless=True,
-                        proxy_url=PROXY_URL or None,
-                    )
-
-                    # Log login result
-                    log_event(run_id, login_status, client_id=cid, client=cname)
-
-                    if updated_cookies:
-                        cookies = updated_cookies
-
-                    rows = load_csv_to_staging(csv_path, cname)
-                    duration = int((datetime.now() - started_at).total_seconds())
-                    print(f"[extract] {cname}: {rows} filas en {duration}s")
-
-                    # Log successful scraping + load
-                    log_event(run_id, "scraping_done", client_id=cid, client=cname, rows_count=rows)
-
-                except Exception as e:
-                    print(f"[extract] Error en {cname}: {e}")
-                    failed_clients.append(client)
-                    log_event(run_id, "scraping_failed", client_id=cid, client=cname, error_message=str(e))
-
-                # Delay between workspaces (same account)
+                queued = None
+
+                # Hold a scrape slot only for this workspace; accounts with more
+                # estimated work left get freed slots first
+                priority = account_remaining_seconds(account_clients[i:], estimates)
+                async with slots.slot(priority):
+                    # Log scraping start
+                    log_event(run_id, "scraping", client_id=cid, client=cname)
+
+                    started_at = datetime.now()
+                    try:
+                        download_dir = DOWNLOAD_DIR / cname.lower().replace(" ", "_")
+
+                        # Log login attempt
+                        log_event(run_id, "login_started", client_id=cid, client=cname)
+
+                        # Direct HTTP export with the session cookies, else the browser flow
+                        timings = {}
+                        csv_path, updated_cookies, login_status, context = await export_workspace(
+                            pool, exporter, context, email, password, cookies,
+                            client["team_id"], download_dir, timings,
+                        )
+
+                        # Log login result
+                        log_event(run_id, login_status, client_id=cid, client=cname)
+                        session_confirmed = True
+
+                        if updated_cookies:
+                            cookies = updated_cookies
+                            if login_status == "login_done":
+                                await asyncio.to_thread(save_session, email, cookies)
+
+                        duration = (datetime.now() - started_at).total_seconds()
+                        record_timings(timings, client_id=cid, client=cname)
+                        record("scrape", duration, client_id=cid, client=cname)
+                        SCRAPE_SECONDS.observe(duration)
+                        observe_session(login_status)
+                        stages["scrape"]["items"] += 1
+                        stages["scrape"]["seconds"] += duration
+                        print(f"[extract] {cname}: CSV descargado en {int(duration)}s, en cola de carga")
+                        queued = (client, csv_path, timings)
+
+                    except Exception as e:
+                        print(f"[extract] Error en {cname}: {e}")
+                        failures.append(failure(client, e, "scrape"))
+                        log_event(run_id, "scraping_failed", client_id=cid, client=cname, error_message=str(e),
+                                  details={"error_class": failures[-1]["error_class"]})
+
+                        # A cached session that never worked is likely stale — start fresh
+                        if cached_session and not session_confirmed:
+                            await asyncio.to_thread(invalidate_session, email)
+                            cookies = None
+                            cached_session = False
+                            if context is not None:
+                                await close_context(context)
+                                context = None
+
+                # Blocks only when the load workers are behind (backpressure)
+                if queued is not None:
+                    await load_queue.put(queued)
+
+                # Delay between workspaces (same account) — slot is free meanwhile
                 if i < len(account_clients) - 1:
                     await random_delay(30, 60)
-
-    # Launch all accounts in parallel (semaphore limits concurrent browsers)
-    await asyncio.gather(*[
-        process_account(email, accs)
-        for email, accs in accounts.items()
-    ])
-
-    # Retry failed
-    if failed_clients:
-        await _retry_failed(failed_clients, run_id, max_retries=3)
-
-    # Transform: staging → core + refresh materialized view
+        finally:
+            if context is not None:
+                await close_context(context)
+            if session_confirmed and cookies:
+                await asyncio.to_thread(save_session, email, cookies)
+            # Keep the secret only if a retry may still need it
+            if not any(f["client"]["email"] == email for f in failures):
+                credentials.release(email)
+
+    async def run_account(pool: BrowserPool, exporter: HttpExporter, email: str, account_clients: list[dict]):
+        # Waiting accounts start in longest-first order as others finish
+        async with open_accounts:
+            await process_account(pool, exporter, email, account_clients)
+
+    loaders = [asyncio.create_task(load_worker()) for _ in range(max(1, LOAD_WORKERS))]
+
+    # One pool of browsers (and one HTTP client) for the whole run; contexts are isolated per account
+    try:
+        async with (
+            BrowserPool(headless=True, proxy_url=PROXY_URL or None) as pool,
+            HttpExporter(proxy_url=PROXY_URL or None) as exporter,
+        ):
+            # Up to ACCOUNT_CONCURRENCY accounts in parallel; scrape slots limit concurrent workspaces
+            scrape_started = time.perf_counter()
+            await asyncio.gather(*[
+                run_account(pool, exporter, email, accs)
+                for email, accs in ordered_accounts
+            ])
+            scrape_wall = time.perf_counter() - scrape_started
+
+            # Drain the load queue before retrying (retries need the final failure list)
+            for _ in loaders:
+                await load_queue.put(None)
+            await asyncio.gather(*loaders)
+            load_wall = time.perf_counter() - scrape_started
+
+            # Retry failures concurrently, with a policy per error class
+            if failures:
+                retries = RetryScheduler(run_id, pool, exporter, credentials, slots, open_accounts)
+                retry_started = time.perf_counter()
+                recovered = await retries.retry_all(failures)
+                loaded_clients += recovered
+                stages["retry"] = {
+                    "failures": len(failures),
+                    "recovered": len(recovered),
+                    "by_class": dict(retries.by_class),
+                    "wall_seconds": round(time.perf_counter() - retry_started, 1),
+                }
+    finally:
+        # Already finished on success; on cancellation (lost shard) or an error
+        # they'd otherwise wait on load_queue.get() for the life of the process
+        for task in loaders:
+            task.cancel()
+        await asyncio.gather(*loaders, return_exceptions=True)
+        credentials.release_all()
+
+    log_event(run_id, "browser_pool_closed", details=pool.stats())
+    log_event(run_id, "stages_summary", details=_stage_throughput(stages, scrape_wall, load_wall))
+    return loaded_clients
+
+
+def finish_run(run_id: str, loaded_clients: list[str]):
+    """Transform staging → core (only clients reloaded in this run) + refresh materialized view."""
+    with profile_scope(run_id=run_id):
+        _finish_run(run_id, loaded_clients)
+
+
+def _finish_run(run_id: str, loaded_clients: list[str]):
     try:
         log_event(run_id, "transform_started")
-        rows = transform_staging_to_core()
-        log_event(run_id, "transform_done", rows_count=rows)
+        counts = transform_staging_to_core(loaded_clients)
+        # rows_count stays the report size (dashboard "Filas"); the delta goes in details
+        rows = counts.pop("rows")
+        log_event(run_id, "transform_done", rows_count=rows, details=counts)
     except Exception as e:
         log_event(run_id, "transform_failed", error_message=str(e))
         print(f"[extract] Error en transform: {e}")
 
     log_event(run_id, "pipeline_completed")
-    print("[extract] Pipeline completado")
-
-
-async def _retry_failed(failed_clients: list[dict], run_id: str, max_retries: int = 3):
-    """Retry clients that failed."""
-    print(f"[retry] Reintentando {len(failed_clients)} clientes fallidos...")
-
-    for attempt in range(1, max_retries + 1):
-        still_failed = []
-
-        for client in failed_clients:
-            cid = client["id"]
-            cname = client["name"]
-            log_event(run_id, "retry", client_id=cid, client=cname,
-                      error_message=f"intento {attempt}")
-            try:
-                password = decrypt(client["password_encrypted"])
-                download_dir = DOWNLOAD_DIR / cname.lower().replace(" ", "_")
-
-                csv_path, _, login_status = await download_contacts_csv(
-                    email=client["email"],
-                    password=password,
-                    team_id=client["team_id"],
-                    download_dir=download_dir,
-                    headless=True,
-                    proxy_url=PROXY_URL or None,
-                )
-
-                rows = load_csv_to_staging(csv_path, cname)
-                print(f"[retry] {cname} exitoso en intento {attempt}: {rows} filas")
-                log_event(run_id, "scraping_done", client_id=cid, client=cname, rows_count=rows)
-
-            except Exception as e:
-                still_failed.append(client)
-                print(f"[retry] {cname} falló intento {attempt}: {e}")
-                log_event(run_id, "scraping_failed", client_id=cid, client=cname,
-                          error_message=f"retry {attempt}: {e}")
 
-        failed_clients = still_failed
-        if not failed_clients:
-            break
 
-        await backoff_delay(attempt)
+def _stage_throughput(stages: dict, scrape_wall: float, load_wall: float) -> dict:
+    """Per-stage busy time, wall time and throughput for the run log."""
+    scrape, load = stages["scrape"], stages["load"]
+    summary = {
+        "scrape": {
+            "workspaces": scrape["items"],
+            "busy_seconds": round(scrape["seconds"], 1),
+            "wall_seconds": round(scrape_wall, 1),
+            "workspaces_per_min": round(scrape["items"] / scrape_wall * 60, 2) if scrape_wall else 0,
+        },
+        "load": {
+            "files": load["items"],
+            "rows": load["rows"],
+            "busy_seconds": round(load["seconds"], 1),
+            "wall_seconds": round(load_wall, 1),
+            "rows_per_sec": round(load["rows"] / load["seconds"]) if load["seconds"] else 0,
+        },
+    }
+    if "retry" in stages:
+        summary["retry"] = stages["retry"]
+    print(f"[extract] Etapas: {summary}")
+    return summary
@@ -0,0 +1,29 @@
+"""Content fingerprints of workspace exports, to skip reloading unchanged CSVs."""
+import hashlib
+from pathlib import Path
+
+from sqlalchemy import text
+
+from app.db import engine
+
+
+def file_fingerprint(csv_path: Path, block_size: int = 1 << 20) -> str:
+    """SHA-256 of the file contents, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_synced_fingerprint(client_name: str) -> tuple[str, int] | None:
+    """Return (hash, rows) of the client's last load, if it also reached core."""
+    with engine.connect() as conn:
+        row = conn.execute(
+            text(
+                "SELECT content_hash, rows_count FROM core.contact_report_export_hashes "
+                "WHERE client = :client AND synced"
+            ),
+            {"client": client_name},
+        ).fetchone()
+    return (row[0], row[1]) if row else None
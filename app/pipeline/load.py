@@ -1,33 +1,131 @@
 """Load raw CSV into staging.contacts_report (no transformations)."""
+import io
+import time
 from pathlib import Path
 
 import pandas as pd
 from sqlalchemy import text
 
+from app.config import LOAD_CHUNK_SIZE
 from app.db import engine
+from app.pipeline.fingerprint import file_fingerprint, get_synced_fingerprint
+from app.pipeline.profiler import record, timer
 
+# Map CSV columns to staging schema
+COLUMN_MAP = {
+    "Email": "email",
+    "First Name": "first_name",
+    "Last Name": "last_name",
+    "Account Name": "company",
+    "Added On": "adding_date",
+    "Sequence": "sequence",
+}
 
-def load_csv_to_staging(csv_path: Path, client_name: str) -> int:
+
+def stage_export(csv_path: Path, client_name: str) -> tuple[int, bool]:
+    """Load the export into staging unless it's identical to the last synced load.
+
+    Returns (rows, loaded) — loaded is False when the load was skipped.
+    """
+    content_hash = file_fingerprint(csv_path)
+    previous = get_synced_fingerprint(client_name)
+    if previous and previous[0] == content_hash:
+        print(f"[load] {client_name}: export sin cambios, omitiendo carga")
+        return previous[1] or 0, False
+
+    rows = load_csv_to_staging(csv_path, client_name, content_hash=content_hash)
+    return rows, True
+
+
+def load_csv_to_staging(
+    csv_path: Path,
+    client_name: str,
+    chunk_size: int | None = None,
+    content_hash: str | None = None,
+) -> int:
     """
     Read CSV, add client column, DELETE existing rows for this client,
-    then bulk INSERT into staging.contacts_report.
+    then bulk load into staging.contacts_report with COPY FROM STDIN.
+
+    The file is parsed and copied in batches of `chunk_size` rows
+    (default LOAD_CHUNK_SIZE) so memory stays flat regardless of export size;
+    chunk_size=0 reads the whole file at once. All batches share the DELETE's
+    transaction, so the per-client replacement stays atomic.
+
+    When `content_hash` is given it's recorded for the client in the same
+    transaction (unsynced until the transform picks it up); otherwise any
+    stored hash for the client is dropped.
 
     Returns number of rows loaded.
     """
-    df = pd.read_csv(csv_path, dtype=str)
-
-    # Map CSV columns to staging schema
-    column_map = {
-        "Email": "email",
-        "First Name": "first_name",
-        "Last Name": "last_name",
-        "Account Name": "company",
-        "Added On": "adding_date",
-        "Sequence": "sequence",
-    }
+    if chunk_size is None:
+        chunk_size = LOAD_CHUNK_SIZE
+
+    if chunk_size > 0:
+        chunks = pd.read_csv(csv_path, dtype=str, chunksize=chunk_size)
+    else:
+        chunks = [pd.read_csv(csv_path, dtype=str)]
+
+    rows = 0
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        # Delete existing rows for this client (daily replacement)
+        with timer("db_delete"):
+            conn.execute(
+                text("DELETE FROM staging.contacts_report WHERE client = :client"),
+                {"client": client_name},
+            )
+
+        # Bulk load — same transaction as the DELETE
+        parse_seconds = insert_seconds = 0.0
+        chunk_iter = iter(chunks)
+        while True:
+            parse_started = time.perf_counter()
+            chunk = next(chunk_iter, None)
+            if chunk is None:
+                break
+            df = _normalize_chunk(chunk, client_name)
+            insert_started = time.perf_counter()
+            parse_seconds += insert_started - parse_started
+
+            _copy_dataframe(conn, df, "staging.contacts_report")
+            insert_seconds += time.perf_counter() - insert_started
+            rows += len(df)
+
+        record("csv_parse", parse_seconds)
+        record("db_insert", insert_seconds)
 
+        if content_hash:
+            conn.execute(
+                text("""
+                    INSERT INTO core.contact_report_export_hashes
+                        (client, content_hash, rows_count, loaded_at, synced)
+                    VALUES (:client, :hash, :rows, now(), false)
+                    ON CONFLICT (client) DO UPDATE SET
+                        content_hash = EXCLUDED.content_hash,
+                        rows_count = EXCLUDED.rows_count,
+                        loaded_at = EXCLUDED.loaded_at,
+                        synced = false
+                """),
+                {"client": client_name, "hash": content_hash, "rows": rows},
+            )
+        else:
+            # Staging no longer matches any recorded export
+            conn.execute(
+                text("DELETE FROM core.contact_report_export_hashes WHERE client = :client"),
+                {"client": client_name},
+            )
+
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed > 0 else 0
+    print(f"[load] {client_name}: {rows} filas cargadas a staging en {elapsed:.2f}s ({rate:,.0f} filas/s)")
+    return rows
+
+
+def _normalize_chunk(df: pd.DataFrame, client_name: str) -> pd.DataFrame:
+    """Apply the staging column mapping and coercions to one batch of CSV rows."""
     # Only keep columns that exist in the CSV
-    existing_cols = {k: v for k, v in column_map.items() if k in df.columns}
+    existing_cols = {k: v for k, v in COLUMN_MAP.items() if k in df.columns}
     df = df.rename(columns=existing_cols)
     df = df[[v for v in existing_cols.values()]]
 
@@ -46,22 +144,30 @@ def load_csv_to_staging(csv_path: Path, client_name: str) -> int:
     if "reply_id" in df.columns:
         df["reply_id"] = pd.to_numeric(df["reply_id"], errors="coerce")
 
-    with engine.begin() as conn:
-        # Delete existing rows for this client (daily replacement)
-        conn.execute(
-            text("DELETE FROM staging.contacts_report WHERE client = :client"),
-            {"client": client_name},
-        )
-
-        # Bulk insert
-        df.to_sql(
-            "contacts_report",
-            conn,
-            schema="staging",
-            if_exists="append",
-            index=False,
-        )
-
-    rows = len(df)
-    print(f"[load] {client_name}: {rows} filas cargadas a staging")
-    return rows
+    return df
+
+
+def _copy_dataframe(conn, df: pd.DataFrame, table: str):
+    """Stream a DataFrame into `table` with COPY FROM STDIN (CSV format).
+
+    NaN/NaT are written as unquoted empty fields, which COPY reads as NULL —
+    the same result `to_sql` produced.
+    """
+    if df.empty:
+        return
+
+    out = df
+    # to_numeric yields float64; COPY won't cast "123.0" into a BIGINT column
+    if "reply_id" in out.columns:
+        out = out.assign(reply_id=out["reply_id"].round().astype("Int64"))
+
+    buf = io.StringIO()
+    out.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+
+    columns = ", ".join(out.columns)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buf)
+    finally:
+        cursor.close()
@@ -1,12 +1,24 @@
-"""Pipeline logging to core.contact_report_extraction_logs."""
+"""Pipeline logging to core.contact_report_extraction_logs.
+
+Events are buffered in memory and written in batches by a background thread
+(every LOG_FLUSH_INTERVAL seconds or once LOG_BATCH_SIZE events are pending),
+so log_event never does DB I/O on the caller's thread or event loop.
+"""
+import atexit
+import json
 import logging
+import signal
 import sys
+import threading
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 
 from sqlalchemy import text
 
+from app.config import LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL
 from app.db import engine
+from app.pipeline.profiler import flush_metrics
+from app.pipeline.run_summary import update_run_summaries
 
 logging.basicConfig(
     level=logging.INFO,
@@ -16,6 +28,22 @@ logging.basicConfig(
 )
 log = logging.getLogger("pipeline")
 
+# Postgres channel notified with {"run_id": ...} after each flush (see app.live)
+NOTIFY_CHANNEL = "contact_report_logs"
+# Serializes flushes across processes, so log ids increase in commit order
+_FLUSH_LOCK_KEY = 0x636F6E74  # arbitrary, unique to this table
+
+_COLUMNS = ("run_id", "client_id", "client", "status", "rows_count", "error_message", "details", "created_at")
+# Events kept across failed flushes before the oldest are dropped
+_MAX_PENDING = 10_000
+
+_pending: list[dict] = []
+_pending_lock = threading.Lock()
+_flush_lock = threading.Lock()  # one writer at a time
+_wakeup = threading.Event()
+_flusher: threading.Thread | None = None
+_exit_handlers_installed = False
+
 
 def new_run_id() -> str:
     """Generate a new UUID for a pipeline run."""
@@ -29,8 +57,12 @@ def log_event(
     client: str | None = None,
     rows_count: int | None = None,
     error_message: str | None = None,
+    details: dict | None = None,
 ):
-    """Insert a log row and print to stdout."""
+    """Queue a log row for the next batch and print to stdout.
+
+    `details` is stored as JSONB for structured extras (e.g. transform counts).
+    """
     parts = [f"[{status}]"]
     if client:
         parts.append(client)
@@ -38,22 +70,130 @@ def log_event(
         parts.append(f"{rows_count:,} filas")
     if error_message:
         parts.append(f"ERROR: {error_message}")
+    if details:
+        parts.append(" ".join(f"{k}={v}" for k, v in details.items()))
     log.info(" ".join(parts))
 
-    with engine.begin() as conn:
-        conn.execute(
-            text("""
-                INSERT INTO core.contact_report_extraction_logs
-                    (run_id, client_id, client, status, rows_count, error_message)
-                VALUES
-                    (:run_id, :client_id, :client, :status, :rows_count, :error_message)
-            """),
-            {
-                "run_id": run_id,
-                "client_id": client_id,
-                "client": client,
-                "status": status,
-                "rows_count": rows_count,
-                "error_message": error_message,
-            },
-        )
+    event = {
+        "run_id": run_id,
+        "client_id": client_id,
+        "client": client,
+        "status": status,
+        "rows_count": rows_count,
+        "error_message": error_message,
+        "details": json.dumps(details) if details else None,
+        # Stamped here, not at flush time, so ordering reflects when it happened
+        "created_at": datetime.now(timezone.utc),
+    }
+
+    with _pending_lock:
+        _pending.append(event)
+        size = len(_pending)
+
+    _ensure_flusher()
+    if size >= LOG_BATCH_SIZE:
+        _wakeup.set()
+
+
+def flush_events():
+    """Write every pending event (and stage timing) now, blocking. Safe to call from any thread."""
+    with _flush_lock:
+        with _pending_lock:
+            batch = _pending[:]
+            _pending.clear()
+
+        if batch:
+            try:
+                with engine.begin() as conn:
+                    # Released at commit: a row never commits after one with a higher id,
+                    # which is what live viewers page on (app.live)
+                    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _FLUSH_LOCK_KEY})
+                    _insert_batch(conn, batch)
+                    update_run_summaries(conn, batch)
+                    # Delivered on commit, to live viewers in any process
+                    for run_id in {event["run_id"] for event in batch}:
+                        conn.execute(
+                            text("SELECT pg_notify(:channel, :payload)"),
+                            {"channel": NOTIFY_CHANNEL, "payload": json.dumps({"run_id": run_id})},
+                        )
+            except Exception as e:
+                print(f"[logger] Error escribiendo {len(batch)} eventos: {e}")
+                with _pending_lock:
+                    # Put them back in front for the next attempt, bounded
+                    _pending[:0] = batch
+                    del _pending[:-_MAX_PENDING]
+
+        # Stage timings ride along on the same cadence
+        flush_metrics()
+
+
+def _insert_batch(conn, batch: list[dict], rows_per_statement: int = 1000):
+    """Multi-row INSERTs (bounded so we stay under Postgres' bind-parameter limit)."""
+    for start in range(0, len(batch), rows_per_statement):
+        _insert_rows(conn, batch[start:start + rows_per_statement])
+
+
+def _insert_rows(conn, batch: list[dict]):
+    rows_sql = []
+    params = {}
+    for i, event in enumerate(batch):
+        placeholders = []
+        for col in _COLUMNS:
+            params[f"{col}_{i}"] = event[col]
+            placeholders.append(
+                f"CAST(:{col}_{i} AS jsonb)" if col == "details" else f":{col}_{i}"
+            )
+        rows_sql.append(f"({', '.join(placeholders)})")
+
+    conn.execute(
+        text(f"""
+            INSERT INTO core.contact_report_extraction_logs ({', '.join(_COLUMNS)})
+            VALUES {', '.join(rows_sql)}
+        """),
+        params,
+    )
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _pending_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_loop, name="log-flusher", daemon=True)
+            _flusher.start()
+
+
+def _flush_loop():
+    while True:
+        _wakeup.wait(LOG_FLUSH_INTERVAL)
+        _wakeup.clear()
+        flush_events()
+
+
+def _on_sigterm(signum, frame):
+    """docker stop: exit so finally blocks and the atexit flush run.
+
+    No I/O here: the signal may land while the main thread is inside
+    log_event or flush_events, holding the locks a flush would need.
+    """
+    sys.exit(128 + signum)
+
+
+def install_exit_handlers():
+    """Flush buffered events when this process exits. Call from pipeline entry points.
+
+    Covers normal exit and unhandled exceptions (atexit) and SIGTERM, which
+    would otherwise kill the process before atexit runs. A SIGTERM handler
+    the process already has (e.g. uvicorn's) is left alone.
+    """
+    global _exit_handlers_installed
+    if _exit_handlers_installed:
+        return
+    _exit_handlers_installed = True
+    atexit.register(flush_events)
+    # Only the main thread can set handlers
+    if threading.current_thread() is not threading.main_thread():
+        return
+    if signal.getsignal(signal.SIGTERM) in (signal.SIG_DFL, None):
+        signal.signal(signal.SIGTERM, _on_sigterm)
@@ -0,0 +1,134 @@
+"""List partitioning of core.contacts_report by client.
+
+Opt-in, once (the old table is kept as core.contacts_report_unpartitioned):
+    python3 -m app.migrate --partition
+
+Afterwards the transform creates a client's partition the first time it
+syncs that client; rows of clients without one live in the default partition.
+"""
+import hashlib
+
+from sqlalchemy import text
+
+from app.db import engine
+
+MATVIEW = "core.contacts_report_with_periods_mv"
+DEFAULT_PARTITION = "contacts_report_default"
+
+
+def is_partitioned(conn) -> bool:
+    return bool(conn.execute(text("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table
+            WHERE partrelid = to_regclass('core.contacts_report')
+        )
+    """)).scalar())
+
+
+def partition_name(client: str) -> str:
+    """Stable identifier-safe table name for `client`'s partition."""
+    return f"contacts_report_c_{hashlib.md5(client.encode()).hexdigest()[:16]}"
+
+
+def partition_exists(conn, client: str) -> bool:
+    return conn.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"),
+        {"name": f"core.{partition_name(client)}"},
+    ).scalar()
+
+
+def ensure_client_partitions(conn, clients: list[str]) -> int:
+    """Create missing partitions, moving the clients' rows out of the default one.
+
+    ATTACH PARTITION takes only a SHARE UPDATE EXCLUSIVE lock on the parent,
+    but an ACCESS EXCLUSIVE lock on the default partition (scanned to check
+    none of its rows belong to the new one) and on the new table, held until
+    the transaction ends; readers of core.contacts_report wait meanwhile.
+    Run it in its own short transaction. Returns partitions created.
+    """
+    created = 0
+    for client in clients:
+        if partition_exists(conn, client):
+            continue
+        name = partition_name(client)
+        literal = conn.execute(text("SELECT quote_literal(:client)"), {"client": client}).scalar()
+
+        conn.execute(text(
+            f"CREATE TABLE core.{name} "
+            f"(LIKE core.contacts_report INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        ))
+        conn.execute(
+            text(f"""
+                WITH moved AS (
+                    DELETE FROM core.{DEFAULT_PARTITION} WHERE client = :client RETURNING *
+                )
+                INSERT INTO core.{name} SELECT * FROM moved
+            """),
+            {"client": client},
+        )
+        # Lets ATTACH skip scanning the new table to validate it. Raw SQL: the
+        # literal may contain ':' and text() would read it as a bind parameter.
+        conn.exec_driver_sql(f"ALTER TABLE core.{name} ADD CHECK (client IS NOT NULL AND client = {literal})")
+        conn.exec_driver_sql(f"ALTER TABLE core.contacts_report ATTACH PARTITION core.{name} FOR VALUES IN ({literal})")
+        created += 1
+
+    if created:
+        print(f"[partitions] {created} particiones nuevas en core.contacts_report")
+    return created
+
+
+def partition_contacts_report():
+    """Rebuild core.contacts_report as a LIST-partitioned table, one partition per client.
+
+    The materialized view depends on the table, so its definition and indexes
+    are saved, it's dropped and then recreated on the new table. Grants on it
+    are not carried over. Runs in one transaction.
+    """
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            print("[partitions] core.contacts_report ya está particionada")
+            return
+
+        # Save the view before the rename (its definition would follow the old table)
+        view_sql, view_indexes = None, []
+        if conn.execute(text("SELECT to_regclass(:mv) IS NOT NULL"), {"mv": MATVIEW}).scalar():
+            view_sql = conn.execute(
+                text("SELECT pg_get_viewdef(CAST(:mv AS regclass), true)"), {"mv": MATVIEW},
+            ).scalar()
+            view_indexes = [r[0] for r in conn.execute(text("""
+                SELECT indexdef FROM pg_indexes
+                WHERE schemaname = 'core' AND tablename = 'contacts_report_with_periods_mv'
+            """))]
+            conn.execute(text(f"DROP MATERIALIZED VIEW {MATVIEW}"))
+
+        conn.execute(text("ALTER TABLE core.contacts_report RENAME TO contacts_report_unpartitioned"))
+        conn.execute(text("""
+            CREATE TABLE core.contacts_report
+            (LIKE core.contacts_report_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY LIST (client)
+        """))
+        conn.execute(text(f"CREATE TABLE core.{DEFAULT_PARTITION} PARTITION OF core.contacts_report DEFAULT"))
+
+        clients = [r[0] for r in conn.execute(text(
+            "SELECT DISTINCT client FROM core.contacts_report_unpartitioned WHERE client IS NOT NULL"
+        ))]
+        ensure_client_partitions(conn, clients)
+
+        result = conn.execute(text(
+            "INSERT INTO core.contacts_report SELECT * FROM core.contacts_report_unpartitioned"
+        ))
+        # The old table keeps contacts_report_client_email_idx, hence the new name
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS contacts_report_part_client_email_idx "
+            "ON core.contacts_report (client, email)"
+        ))
+
+        if view_sql is not None:
+            conn.exec_driver_sql(f"CREATE MATERIALIZED VIEW {MATVIEW} AS {view_sql}")
+            for indexdef in view_indexes:
+                conn.exec_driver_sql(indexdef)
+
+    print(
+        f"[partitions] core.contacts_report particionada: {result.rowcount} filas, "
+        f"{len(clients)} clientes. Tabla anterior: core.contacts_report_unpartitioned"
+    )
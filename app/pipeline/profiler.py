@@ -0,0 +1,101 @@
+"""Stage timings per run and client, stored in core.contact_report_stage_metrics.
+
+    with profile_scope(run_id=run_id):            # set once per run
+        with profile_scope(client_id=1, client="Acme"):
+            with timer("db_insert"):
+                ...
+
+The scope lives in a contextvar, so it follows asyncio tasks and
+asyncio.to_thread calls without being passed around. Timings recorded outside
+a run scope are dropped. Samples are buffered and written by the logger's
+flush (same thread, same cadence).
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from app.db import engine
+
+_scope: ContextVar[dict | None] = ContextVar("profile_scope", default=None)
+
+_MAX_PENDING = 50_000
+_pending: list[dict] = []
+_lock = threading.Lock()
+
+
+@contextmanager
+def profile_scope(run_id: str | None = None, client_id: int | None = None, client: str | None = None):
+    """Attribute timings recorded inside the block to this run/client (nested scopes merge)."""
+    scope = dict(_scope.get() or {})
+    if run_id is not None:
+        scope["run_id"] = run_id
+    if client_id is not None:
+        scope["client_id"] = client_id
+    if client is not None:
+        scope["client"] = client
+    token = _scope.set(scope)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+@contextmanager
+def timer(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def record(stage: str, seconds: float, **scope):
+    """Record one sample for `stage`; keyword args (client_id, client) override the scope."""
+    current = {**(_scope.get() or {}), **scope}
+    if "run_id" not in current:
+        return
+    sample = {
+        "run_id": current["run_id"],
+        "client_id": current.get("client_id"),
+        "client": current.get("client"),
+        "stage": stage,
+        "seconds": seconds,
+        "created_at": datetime.now(timezone.utc),
+    }
+    with _lock:
+        if len(_pending) < _MAX_PENDING:
+            _pending.append(sample)
+
+
+def record_timings(timings: dict, prefix: str = "ui.", **scope):
+    """Record a `timings` dict filled by the scraper (step → seconds)."""
+    for step, seconds in timings.items():
+        record(f"{prefix}{step}", seconds, **scope)
+
+
+def flush_metrics():
+    """Write buffered samples. Called from app.pipeline.logger.flush_events."""
+    with _lock:
+        batch = _pending[:]
+        _pending.clear()
+    if not batch:
+        return
+
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                text("""
+                    INSERT INTO core.contact_report_stage_metrics
+                        (run_id, client_id, client, stage, seconds, created_at)
+                    VALUES (CAST(:run_id AS uuid), :client_id, :client, :stage, :seconds, :created_at)
+                """),
+                batch,
+            )
+    except Exception as e:
+        print(f"[profiler] Error escribiendo {len(batch)} métricas: {e}")
+        with _lock:
+            _pending[:0] = batch[: _MAX_PENDING - len(_pending)]
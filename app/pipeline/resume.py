@@ -0,0 +1,141 @@
+"""Resume an interrupted run from its log rows.
+
+    python3 -m app.main --resume <run_id> [--force]
+
+Clients whose latest outcome in the run still holds (staged by this run, or
+skipped as unchanged and still in sync) are not scraped again; everyone else
+is, and the transform runs over everything the run staged.
+
+A run that still looks alive (open shards, or an event logged within
+RESUME_STALE_SECONDS) is refused unless --force is given; a Postgres
+advisory lock keeps two resumes of the same run from overlapping.
+"""
+import asyncio
+
+from sqlalchemy import text
+
+from app.config import RESUME_STALE_SECONDS
+from app.db import engine
+from app.pipeline.clients import get_active_clients
+from app.pipeline.extract import finish_run, scrape_clients
+from app.pipeline.logger import flush_events, log_event
+
+
+def run_checkpoint(run_id: str) -> dict | None:
+    """What `run_id` already achieved, or None if there's no such run.
+
+    Returns {"completed": bool, "staged": [...], "skipped": [...]}: staged clients
+    were loaded by this run and staging still holds that load; skipped clients
+    had an unchanged export that is still the synced one.
+    """
+    with engine.connect() as conn:
+        started = conn.execute(
+            text("""
+                SELECT COUNT(*), BOOL_OR(status = 'pipeline_completed')
+                FROM core.contact_report_extraction_logs
+                WHERE run_id = CAST(:run_id AS uuid)
+            """),
+            {"run_id": run_id},
+        ).fetchone()
+        if not started[0]:
+            return None
+
+        # Both sides on the DB clock: the load's hash row is written before its
+        # scraping_done event is flushed, and a later reload would postdate it
+        rows = conn.execute(
+            text("""
+                WITH outcomes AS (
+                    SELECT DISTINCT ON (client) client, status, logged_at
+                    FROM core.contact_report_extraction_logs
+                    WHERE run_id = CAST(:run_id AS uuid)
+                      AND status IN ('scraping_done', 'load_skipped', 'scraping_failed')
+                    ORDER BY client, created_at DESC, id DESC
+                )
+                SELECT o.client, o.status, h.loaded_at <= o.logged_at, h.synced
+                FROM outcomes o
+                LEFT JOIN core.contact_report_export_hashes h ON h.client = o.client
+            """),
+            {"run_id": run_id},
+        ).fetchall()
+
+    staged, skipped = [], []
+    for client, status, loaded_in_run, synced in rows:
+        if status == "scraping_done" and loaded_in_run:
+            staged.append(client)
+        elif status == "load_skipped" and synced:
+            skipped.append(client)
+    return {"completed": bool(started[1]), "staged": staged, "skipped": skipped}
+
+
+def run_activity(run_id: str) -> str | None:
+    """Why `run_id` still looks in progress somewhere, or None if it looks abandoned."""
+    with engine.connect() as conn:
+        open_shards = conn.execute(
+            text("""
+                SELECT COUNT(*) FROM core.contact_report_run_shards
+                WHERE run_id = CAST(:run_id AS uuid) AND status IN ('pending', 'running')
+            """),
+            {"run_id": run_id},
+        ).scalar()
+        idle = conn.execute(
+            text("""
+                SELECT EXTRACT(EPOCH FROM now() - MAX(logged_at))
+                FROM core.contact_report_extraction_logs
+                WHERE run_id = CAST(:run_id AS uuid)
+            """),
+            {"run_id": run_id},
+        ).scalar()
+
+    if open_shards:
+        return f"{open_shards} shards pendientes o en curso"
+    if idle is not None and idle < RESUME_STALE_SECONDS:
+        return f"último evento hace {idle:.0f}s"
+    return None
+
+
+async def resume_pipeline(run_id: str, force: bool = False):
+    """Finish `run_id`: re-scrape only the clients without a valid checkpoint, then transform."""
+    checkpoint = await asyncio.to_thread(run_checkpoint, run_id)
+    if checkpoint is None:
+        print(f"[resume] No existe la ejecución {run_id}")
+        return
+    if checkpoint["completed"]:
+        print(f"[resume] La ejecución {run_id} ya está completada")
+        return
+    activity = None if force else await asyncio.to_thread(run_activity, run_id)
+    if activity:
+        print(f"[resume] La ejecución {run_id} sigue en curso ({activity}); usa --force si su proceso murió")
+        return
+
+    lock = {"key": f"resume:{run_id}"}
+    with engine.connect() as lock_conn:
+        acquired = lock_conn.execute(text("SELECT pg_try_advisory_lock(hashtext(:key))"), lock).scalar()
+        lock_conn.commit()  # session lock: survives the commit, no transaction left open
+        if not acquired:
+            print(f"[resume] Otro proceso ya está reanudando {run_id}")
+            return
+        try:
+            await _resume(run_id, checkpoint)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), lock)
+            lock_conn.commit()
+
+
+async def _resume(run_id: str, checkpoint: dict):
+    done = set(checkpoint["staged"]) | set(checkpoint["skipped"])
+    remaining = [c for c in await asyncio.to_thread(get_active_clients) if c["name"] not in done]
+    log_event(run_id, "pipeline_resumed", rows_count=len(remaining), details={
+        "staged": len(checkpoint["staged"]), "skipped": len(checkpoint["skipped"]),
+    })
+    print(
+        f"[resume] {run_id}: {len(done)} clientes ya listos, "
+        f"{len(remaining)} por extraer"
+    )
+
+    loaded_clients = list(checkpoint["staged"])
+    if remaining:
+        loaded_clients += await scrape_clients(run_id, remaining)
+
+    await asyncio.to_thread(finish_run, run_id, loaded_clients)
+    await asyncio.to_thread(flush_events)
+    print("[resume] Pipeline completado")
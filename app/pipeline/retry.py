@@ -0,0 +1,254 @@
+"""Retry phase: failures are classified and retried concurrently, per-class policy.
+
+Scrape retries of one account run one at a time with the usual politeness
+delay between them, in the run's shared scrape slots, reusing the account's
+cached session. Failures that happened while loading keep their CSV and only
+retry the load.
+"""
+import asyncio
+import random
+import time
+from collections import defaultdict
+
+import httpx
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from sqlalchemy.exc import DBAPIError
+
+from app.config import ACCOUNT_CONCURRENCY, DOWNLOAD_DIR
+from app.metrics import RETRIES, ROWS_LOADED, SCRAPE_SECONDS, observe_session
+from app.pipeline.credentials import CredentialError, CredentialStore
+from app.pipeline.load import stage_export
+from app.pipeline.logger import log_event
+from app.pipeline.profiler import profile_scope, record_timings
+from app.pipeline.scheduler import ScrapeSlots
+from app.pipeline.session_cache import invalidate_session, load_session, save_session
+from app.scraper.browser_pool import BrowserPool
+from app.scraper.export import close_context, export_workspace
+from app.scraper.http_export import HttpExporter, SessionExpired
+from app.scraper.reply_io import LoginFailed
+
+# attempts: retries after the first failure; delay: seconds before the first
+# retry, doubled on each following one; fresh_session: drop cached cookies first
+RETRY_POLICIES = {
+    # Rejected credentials rarely fix themselves: one retry with a clean login
+    "login": {"attempts": 1, "delay": 30.0, "fresh_session": True},
+    "selector_timeout": {"attempts": 3, "delay": 10.0, "fresh_session": False},
+    "download_timeout": {"attempts": 3, "delay": 20.0, "fresh_session": False},
+    # Load-only retries (the CSV is already on disk)
+    "db": {"attempts": 4, "delay": 5.0, "fresh_session": False},
+    "unknown": {"attempts": 2, "delay": 15.0, "fresh_session": True},
+    # The stored password can't be decrypted: retrying won't change that
+    "credentials": {"attempts": 0, "delay": 0.0, "fresh_session": False},
+    # The downloaded CSV is unreadable or gone: reloading the same file fails the same way
+    "parse": {"attempts": 0, "delay": 0.0, "fresh_session": False},
+}
+MAX_RETRY_DELAY = 300.0
+
+
+def classify_error(error: Exception, stage: str) -> str:
+    """Error class for a failure raised while scraping ('scrape') or loading ('load')."""
+    if isinstance(error, CredentialError):
+        return "credentials"
+    # pandas' ParserError and EmptyDataError, and UnicodeDecodeError, are ValueErrors;
+    # OSError covers a missing or unreadable local file
+    if stage == "load" and isinstance(error, (ValueError, OSError)):
+        return "parse"
+    if stage == "load" or isinstance(error, DBAPIError):
+        return "db"
+    if isinstance(error, (LoginFailed, SessionExpired)):
+        return "login"
+    if isinstance(error, PlaywrightTimeoutError):
+        message = str(error).lower()
+        return "download_timeout" if "download" in message else "selector_timeout"
+    if isinstance(error, httpx.TimeoutException):
+        return "download_timeout"
+    return "unknown"
+
+
+def failure(client: dict, error: Exception, stage: str, csv_path=None) -> dict:
+    """Record of a failed client, as collected by scrape_clients for the retry phase."""
+    return {
+        "client": client,
+        "stage": stage,
+        "error_class": classify_error(error, stage),
+        "error": str(error),
+        "csv_path": csv_path,
+        "attempt": 0,
+    }
+
+
+def retry_delay(error_class: str, attempt: int) -> float:
+    delay = min(RETRY_POLICIES[error_class]["delay"] * 2 ** (attempt - 1), MAX_RETRY_DELAY)
+    return delay + random.uniform(0, delay * 0.2)  # jitter
+
+
+class RetryScheduler:
+    """Runs the retry phase of a run. Use retry_all() once, after the first pass."""
+
+    def __init__(
+        self,
+        run_id: str,
+        pool: BrowserPool,
+        exporter: HttpExporter,
+        credentials: CredentialStore,
+        slots: ScrapeSlots,
+        accounts: asyncio.Semaphore | None = None,
+    ):
+        self.run_id = run_id
+        self.pool = pool
+        self.exporter = exporter
+        self.credentials = credentials
+        self.slots = slots
+        # Shared with the first pass, so retries don't open more BrowserContexts than it did
+        self.accounts = accounts or asyncio.Semaphore(max(1, ACCOUNT_CONCURRENCY))
+        self.recovered: list[str] = []
+        self.by_class: dict[str, int] = defaultdict(int)
+
+    async def retry_all(self, failures: list[dict]) -> list[str]:
+        """Retry every failure. Returns the names of clients reloaded into staging."""
+        started = time.perf_counter()
+        loads = [f for f in failures if f["stage"] == "load"]
+        scrapes = defaultdict(list)
+        for f in failures:
+            self.by_class[f["error_class"]] += 1
+            if f["stage"] == "scrape":
+                scrapes[f["client"]["email"]].append(f)
+
+        print(f"[retry] Reintentando {len(failures)} clientes fallidos: {dict(self.by_class)}")
+        await asyncio.gather(
+            *[self._retry_load(f) for f in loads],
+            *[self._retry_account(email, account_failures) for email, account_failures in scrapes.items()],
+        )
+        print(f"[retry] {len(self.recovered)} recuperados en {time.perf_counter() - started:.0f}s")
+        return self.recovered
+
+    async def _retry_load(self, f: dict):
+        """Reload the already-downloaded CSV; no scraping."""
+        while self._next_attempt(f):
+            await asyncio.sleep(retry_delay(f["error_class"], f["attempt"]))
+            self._log_retry(f)
+            try:
+                await self._stage(f, f["csv_path"], timings={})
+                return
+            except Exception as e:
+                self._failed(f, e, "load")
+
+    async def _retry_account(self, email: str, failures: list[dict]):
+        async with self.accounts:
+            await self._retry_account_failures(email, failures)
+
+    async def _retry_account_failures(self, email: str, failures: list[dict]):
+        cookies = await asyncio.to_thread(load_session, email)
+        context = None
+        session_confirmed = False
+        now = time.monotonic()
+        for f in failures:
+            f["due"] = now + retry_delay(f["error_class"], 1)
+        next_allowed = now  # politeness delay between workspaces of this account
+        load_retries = []
+
+        try:
+            while True:
+                pending = [f for f in failures if f["stage"] == "scrape" and self._can_retry(f)]
+                if not pending:
+                    break
+                f = min(pending, key=lambda item: item["due"])
+                await asyncio.sleep(max(0.0, max(f["due"], next_allowed) - time.monotonic()))
+
+                self._next_attempt(f)
+                if RETRY_POLICIES[f["error_class"]]["fresh_session"] and cookies:
+                    await asyncio.to_thread(invalidate_session, email)
+                    cookies = None
+                    session_confirmed = False
+                    if context is not None:
+                        await close_context(context)
+                        context = None
+
+                self._log_retry(f)
+                client = f["client"]
+                timings = {}
+                try:
+                    scrape_started = time.perf_counter()
+                    async with self.slots.slot():
+                        csv_path, updated_cookies, login_status, context = await export_workspace(
+                            self.pool, self.exporter, context, email,
+                            self.credentials.password(email), cookies,
+                            client["team_id"],
+                            DOWNLOAD_DIR / client["name"].lower().replace(" ", "_"),
+                            timings,
+                        )
+                    session_confirmed = True
+                    SCRAPE_SECONDS.observe(time.perf_counter() - scrape_started)
+                    observe_session(login_status)
+                    if updated_cookies:
+                        cookies = updated_cookies
+                        if login_status == "login_done":
+                            await asyncio.to_thread(save_session, email, cookies)
+                except Exception as e:
+                    self._failed(f, e, "scrape")
+                    f["due"] = time.monotonic() + retry_delay(f["error_class"], f["attempt"] + 1)
+                    continue
+                finally:
+                    next_allowed = time.monotonic() + random.uniform(30, 60)
+
+                try:
+                    await self._stage(f, csv_path, timings)
+                except Exception as e:
+                    # The CSV is fine: from now on only the load is retried
+                    self._failed(f, e, "load")
+                    f["csv_path"] = csv_path
+                    load_retries.append(asyncio.create_task(self._retry_load(f)))
+
+            await asyncio.gather(*load_retries)
+        finally:
+            if context is not None:
+                await close_context(context)
+            if session_confirmed and cookies:
+                await asyncio.to_thread(save_session, email, cookies)
+            self.credentials.release(email)
+
+    async def _stage(self, f: dict, csv_path, timings: dict):
+        client = f["client"]
+        with profile_scope(client_id=client["id"], client=client["name"]):
+            record_timings(timings)
+            rows, loaded = await asyncio.to_thread(stage_export, csv_path, client["name"])
+        if loaded:
+            self.recovered.append(client["name"])
+            ROWS_LOADED.inc(rows)
+        f["stage"] = "done"
+        print(f"[retry] {client['name']} exitoso en intento {f['attempt']}: {rows} filas")
+        log_event(
+            self.run_id, "scraping_done" if loaded else "load_skipped",
+            client_id=client["id"], client=client["name"], rows_count=rows,
+            details={"ui_seconds": timings, "retry_attempt": f["attempt"]},
+        )
+
+    def _can_retry(self, f: dict) -> bool:
+        return f["attempt"] < RETRY_POLICIES[f["error_class"]]["attempts"]
+
+    def _next_attempt(self, f: dict) -> bool:
+        if not self._can_retry(f):
+            return False
+        f["attempt"] += 1
+        return True
+
+    def _failed(self, f: dict, error: Exception, stage: str):
+        client = f["client"]
+        f["stage"] = stage
+        f["error_class"] = classify_error(error, stage)
+        f["error"] = str(error)
+        print(f"[retry] {client['name']} falló intento {f['attempt']} ({f['error_class']}): {error}")
+        log_event(
+            self.run_id, "scraping_failed", client_id=client["id"], client=client["name"],
+            error_message=f"retry {f['attempt']}: {error}",
+            details={"error_class": f["error_class"]},
+        )
+
+    def _log_retry(self, f: dict):
+        client = f["client"]
+        RETRIES.labels(f["error_class"]).inc()
+        log_event(
+            self.run_id, "retry", client_id=client["id"], client=client["name"],
+            error_message=f"intento {f['attempt']}",
+            details={"error_class": f["error_class"]},
+        )
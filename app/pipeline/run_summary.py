@@ -0,0 +1,109 @@
+"""Per-run summary rows in core.contact_report_run_summaries, kept up to date as events are logged.
+
+Backfill existing history (idempotent; run while no pipeline is active):
+    python3 -m app.pipeline.run_summary
+"""
+from collections import defaultdict
+
+from sqlalchemy import text
+
+from app.db import engine
+
+_UPSERT = """
+    INSERT INTO core.contact_report_run_summaries AS s
+        (run_id, started_at, finished_at, clients_ok, clients_failed, clients_skipped,
+         transform_ok, total_rows, completed, updated_at)
+    VALUES
+        (:run_id, :started_at, :finished_at, :clients_ok, :clients_failed, :clients_skipped,
+         :transform_ok, :total_rows, :completed, now())
+    ON CONFLICT (run_id) DO UPDATE SET
+        started_at = LEAST(s.started_at, EXCLUDED.started_at),
+        finished_at = GREATEST(s.finished_at, EXCLUDED.finished_at),
+        clients_ok = s.clients_ok + EXCLUDED.clients_ok,
+        clients_failed = s.clients_failed + EXCLUDED.clients_failed,
+        clients_skipped = s.clients_skipped + EXCLUDED.clients_skipped,
+        transform_ok = s.transform_ok OR EXCLUDED.transform_ok,
+        total_rows = GREATEST(s.total_rows, EXCLUDED.total_rows),
+        completed = s.completed OR EXCLUDED.completed,
+        updated_at = now()
+"""
+
+
+def update_run_summaries(conn, events: list[dict]):
+    """Fold a batch of just-inserted log events into their runs' summaries.
+
+    Mirrors the aggregates GET /api/runs used to compute with GROUP BY run_id.
+    Runs in the caller's transaction so summaries never drift from the logs.
+    """
+    runs = defaultdict(lambda: {
+        "started_at": None,
+        "finished_at": None,
+        "clients_ok": 0,
+        "clients_failed": 0,
+        "clients_skipped": 0,
+        "transform_ok": False,
+        "total_rows": None,
+        "completed": False,
+    })
+
+    for event in events:
+        run = runs[event["run_id"]]
+        created_at = event["created_at"]
+        if run["started_at"] is None or created_at < run["started_at"]:
+            run["started_at"] = created_at
+        if run["finished_at"] is None or created_at > run["finished_at"]:
+            run["finished_at"] = created_at
+
+        status = event["status"]
+        if status == "scraping_done":
+            run["clients_ok"] += 1
+        elif status == "scraping_failed":
+            run["clients_failed"] += 1
+        elif status == "load_skipped":
+            run["clients_skipped"] += 1
+        elif status == "transform_done":
+            run["transform_ok"] = True
+            if event["rows_count"] is not None:
+                run["total_rows"] = max(run["total_rows"] or 0, event["rows_count"])
+        elif status == "pipeline_completed":
+            run["completed"] = True
+
+    conn.execute(text(_UPSERT), [{"run_id": run_id, **run} for run_id, run in runs.items()])
+
+
+def backfill_run_summaries():
+    """Rebuild every summary from core.contact_report_extraction_logs."""
+    with engine.begin() as conn:
+        result = conn.execute(text("""
+            INSERT INTO core.contact_report_run_summaries
+                (run_id, started_at, finished_at, clients_ok, clients_failed, clients_skipped,
+                 transform_ok, total_rows, completed, updated_at)
+            SELECT
+                run_id,
+                MIN(created_at),
+                MAX(created_at),
+                COUNT(*) FILTER (WHERE status = 'scraping_done'),
+                COUNT(*) FILTER (WHERE status = 'scraping_failed'),
+                COUNT(*) FILTER (WHERE status = 'load_skipped'),
+                COALESCE(BOOL_OR(status = 'transform_done'), false),
+                MAX(CASE WHEN status = 'transform_done' THEN rows_count END),
+                COALESCE(BOOL_OR(status = 'pipeline_completed'), false),
+                now()
+            FROM core.contact_report_extraction_logs
+            GROUP BY run_id
+            ON CONFLICT (run_id) DO UPDATE SET
+                started_at = EXCLUDED.started_at,
+                finished_at = EXCLUDED.finished_at,
+                clients_ok = EXCLUDED.clients_ok,
+                clients_failed = EXCLUDED.clients_failed,
+                clients_skipped = EXCLUDED.clients_skipped,
+                transform_ok = EXCLUDED.transform_ok,
+                total_rows = EXCLUDED.total_rows,
+                completed = EXCLUDED.completed,
+                updated_at = EXCLUDED.updated_at
+        """))
+    print(f"[run_summary] {result.rowcount} ejecuciones recalculadas")
+
+
+if __name__ == "__main__":
+    backfill_run_summaries()
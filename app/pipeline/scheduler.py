@@ -0,0 +1,124 @@
+"""Account scheduling: longest-first ordering from history + priority scrape slots."""
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+
+from sqlalchemy import text
+
+from app.db import engine
+
+# Used for clients with no history yet (roughly one browser-driven workspace)
+DEFAULT_WORKSPACE_SECONDS = 90.0
+# Midpoint of the random_delay(30, 60) between workspaces of the same account
+INTER_WORKSPACE_DELAY = 45.0
+
+
+def workspace_estimates(client_ids: list[int], recent_runs: int = 7) -> dict[int, float]:
+    """Average seconds per client from 'scraping' to its outcome over the last runs."""
+    if not client_ids:
+        return {}
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            WITH recent AS (
+                SELECT run_id
+                FROM core.contact_report_extraction_logs
+                WHERE status = 'pipeline_started'
+                ORDER BY created_at DESC
+                LIMIT :recent_runs
+            ),
+            per_run AS (
+                SELECT
+                    l.run_id,
+                    l.client_id,
+                    MIN(l.created_at) FILTER (WHERE l.status = 'scraping') AS started,
+                    MAX(l.created_at) FILTER (
+                        WHERE l.status IN ('scraping_done', 'load_skipped', 'scraping_failed')
+                    ) AS finished
+                FROM core.contact_report_extraction_logs l
+                JOIN recent r ON r.run_id = l.run_id
+                WHERE l.client_id = ANY(:client_ids)
+                GROUP BY l.run_id, l.client_id
+            )
+            SELECT client_id, AVG(EXTRACT(EPOCH FROM finished - started))
+            FROM per_run
+            WHERE started IS NOT NULL AND finished > started
+            GROUP BY client_id
+        """), {"recent_runs": recent_runs, "client_ids": client_ids}).fetchall()
+
+    return {r[0]: float(r[1]) for r in rows}
+
+
+def account_remaining_seconds(account_clients: list[dict], estimates: dict[int, float]) -> float:
+    """Estimated wall time to finish `account_clients`, including politeness delays."""
+    work = sum(estimates.get(c["id"], DEFAULT_WORKSPACE_SECONDS) for c in account_clients)
+    return work + INTER_WORKSPACE_DELAY * max(0, len(account_clients) - 1)
+
+
+def order_longest_first(accounts: dict[str, list[dict]], estimates: dict[int, float]) -> list[tuple[str, list[dict]]]:
+    """Accounts sorted by estimated total duration, longest first (LPT scheduling)."""
+    return sorted(
+        accounts.items(),
+        key=lambda item: account_remaining_seconds(item[1], estimates),
+        reverse=True,
+    )
+
+
+def split_into_shards(
+    accounts: dict[str, list[dict]], estimates: dict[int, float], shards: int,
+) -> list[list[str]]:
+    """Account emails per shard, balanced on estimated duration (greedy LPT). Empty shards are dropped."""
+    groups = [[] for _ in range(max(1, shards))]
+    loads = [(0.0, i) for i in range(len(groups))]
+    for email, account_clients in order_longest_first(accounts, estimates):
+        load, i = heapq.heappop(loads)
+        groups[i].append(email)
+        heapq.heappush(loads, (load + account_remaining_seconds(account_clients, estimates), i))
+    return [g for g in groups if g]
+
+
+class ScrapeSlots:
+    """
+    Limits concurrent scraping to `slots`, like asyncio.Semaphore, but hands a
+    freed slot to the waiter with the highest priority (FIFO on ties).
+
+    Accounts hold a slot only while scraping a workspace and release it during
+    the politeness delay, so another account can use it.
+    """
+
+    def __init__(self, slots: int):
+        self._free = slots
+        self._waiters = []  # heap of (-priority, seq, future)
+        self._seq = itertools.count()
+
+    @asynccontextmanager
+    async def slot(self, priority: float = 0):
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: float):
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Slot was handed over just before the cancellation — pass it on
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._free += 1
@@ -0,0 +1,75 @@
+"""Encrypted Playwright storage_state per Reply.io account, reused across runs."""
+import json
+from datetime import datetime, timedelta, timezone
+
+from cryptography.fernet import InvalidToken
+from sqlalchemy import text
+
+from app.config import SESSION_MAX_AGE_HOURS
+from app.db import engine
+from app.utils.crypto import decrypt, encrypt
+
+
+def load_session(email: str) -> str | None:
+    """Return the cached storage_state JSON for `email`, or None if missing/expired."""
+    with engine.connect() as conn:
+        row = conn.execute(
+            text(
+                "SELECT storage_state_encrypted FROM core.reply_sessions "
+                "WHERE email = :email AND expires_at > now()"
+            ),
+            {"email": email},
+        ).fetchone()
+
+    if not row:
+        return None
+
+    try:
+        return decrypt(row[0])
+    except InvalidToken:
+        print(f"[session_cache] Sesión ilegible para {email} (¿FERNET_KEY rotada?), descartando")
+        invalidate_session(email)
+        return None
+
+
+def save_session(email: str, storage_state_json: str):
+    """Encrypt and upsert the session, expiring with its earliest auth cookie."""
+    expires_at = _session_expiry(storage_state_json)
+    with engine.begin() as conn:
+        conn.execute(
+            text("""
+                INSERT INTO core.reply_sessions
+                    (email, storage_state_encrypted, expires_at, updated_at)
+                VALUES (:email, :state, :expires_at, now())
+                ON CONFLICT (email) DO UPDATE SET
+                    storage_state_encrypted = EXCLUDED.storage_state_encrypted,
+                    expires_at = EXCLUDED.expires_at,
+                    updated_at = EXCLUDED.updated_at
+            """),
+            {"email": email, "state": encrypt(storage_state_json), "expires_at": expires_at},
+        )
+
+
+def invalidate_session(email: str):
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM core.reply_sessions WHERE email = :email"), {"email": email})
+
+
+def _session_expiry(storage_state_json: str) -> datetime:
+    """Earliest expiry among persistent reply.io cookies, capped at SESSION_MAX_AGE_HOURS."""
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(hours=SESSION_MAX_AGE_HOURS)
+
+    try:
+        cookies = json.loads(storage_state_json).get("cookies", [])
+    except (json.JSONDecodeError, AttributeError):
+        return now
+
+    for cookie in cookies:
+        # expires == -1 marks a session cookie (no fixed expiry)
+        if "reply.io" in cookie.get("domain", "") and cookie.get("expires", -1) > 0:
+            cookie_exp = datetime.fromtimestamp(cookie["expires"], tz=timezone.utc)
+            if cookie_exp > now:
+                expires_at = min(expires_at, cookie_exp)
+
+    return expires_at
@@ -1,37 +1,283 @@
 """Transform staging.contacts_report → core.contacts_report + refresh materialized view."""
 from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 
 from app.db import engine
+from app.pipeline.partitions import MATVIEW, ensure_client_partitions, is_partitioned
+from app.pipeline.profiler import timer
 
+_CORE_COLUMNS = "reply_id, email, domain, first_name, last_name, company, adding_date, client"
+# Identity of a row that can't be keyed on (client, email); domain derives from email
+_ROW_HASH = "md5(CAST(ROW(email, reply_id, first_name, last_name, company, adding_date) AS text))"
 
-def transform_staging_to_core() -> int:
-    """Delete core data, insert from staging, refresh materialized view."""
-    with engine.begin() as conn:
-        # 1. Delete existing core data
-        conn.execute(text("DELETE FROM core.contacts_report"))
-
-        # 2. Insert from staging to core
-        result = conn.execute(text("""
-            INSERT INTO core.contacts_report (
-                reply_id, email, domain, first_name, last_name,
-                company, adding_date, client
+# Core rows of the synced clients not keyed by _incoming, numbered within each
+# identical group so they can be matched one-to-one against _unkeyed
+_CORE_UNKEYED = f"""
+    SELECT k.tableoid AS part, k.ctid AS row_id, k.client, {_ROW_HASH} AS h,
+           ROW_NUMBER() OVER (PARTITION BY k.client, {_ROW_HASH}) AS n
+    FROM core.contacts_report k
+    WHERE k.client = ANY(:clients)
+      AND (
+          k.email IS NULL
+          OR NOT EXISTS (
+              SELECT 1 FROM _incoming i
+              WHERE i.client = k.client AND i.email = k.email
+          )
+      )
+"""
+
+
+def transform_staging_to_core(clients: list[str]) -> dict:
+    """
+    Incrementally sync core.contacts_report with staging, keyed on (client, email).
+
+    Only the given clients are touched. For each one, rows missing from
+    staging are deleted, changed rows updated and new rows inserted. Rows
+    that can't be keyed (no email, or an email repeated within the client's
+    export) are matched as identical copies, so core keeps every staged row
+    and counts reflect only real changes.
+
+    Returns {"inserted": n, "updated": n, "deleted": n, "rows": n} — rows is
+    the size of core.contacts_report after the sync, kept as a running total
+    (counted once, then moved by each sync's delta).
+
+    A sync that changed core marks the report view stale in the same
+    transaction; the refresh that follows clears the mark only once it
+    succeeds, so a failed refresh is retried by the next transform.
+    """
+    counts = {"inserted": 0, "updated": 0, "deleted": 0}
+    clients = list(clients)
+
+    with timer("transform"):
+        if clients:
+            # Own short transaction: ATTACH PARTITION keeps the default partition
+            # locked until commit, which must not last the whole sync
+            with engine.begin() as conn:
+                if is_partitioned(conn):
+                    ensure_client_partitions(conn, clients)
+
+        with engine.begin() as conn:
+            if clients:
+                _sync_clients(conn, clients, counts)
+
+                # Exports loaded for these clients are now reflected in core
+                conn.execute(
+                    text(
+                        "UPDATE core.contact_report_export_hashes SET synced = true "
+                        "WHERE client = ANY(:clients)"
+                    ),
+                    {"clients": clients},
+                )
+            else:
+                print("[transform] Sin clientes modificados, nada que sincronizar")
+
+            print(
+                f"[transform] {len(clients)} clientes: {counts['inserted']} insertadas, "
+                f"{counts['updated']} actualizadas, {counts['deleted']} eliminadas en core.contacts_report"
             )
-            SELECT
-                reply_id,
-                email,
-                split_part(email, '@', 2) AS domain,
-                first_name,
-                last_name,
-                company,
-                adding_date,
-                client
-            FROM staging.contacts_report
-        """))
-        rows = result.rowcount
-        print(f"[transform] {rows} filas insertadas en core.contacts_report")
-
-        # 3. Refresh materialized view
-        conn.execute(text("REFRESH MATERIALIZED VIEW core.contacts_report_with_periods_mv"))
-        print("[transform] Materialized view refreshed")
-
-    return rows
+            total_rows = _record_sync(conn, counts)
+
+    # After the sync has committed; also catches up on a refresh that failed last time
+    refresh_report_view()
+
+    return {**counts, "rows": total_rows}
+
+
+def _record_sync(conn, counts: dict) -> int:
+    """Move the running row total by this sync's delta and mark the view stale if core changed.
+
+    Returns the new total. Without a total yet, core is counted once.
+    """
+    params = {
+        "mv": MATVIEW,
+        "delta": counts["inserted"] - counts["deleted"],
+        "bump": 1 if any(counts.values()) else 0,
+    }
+    total_rows = conn.execute(
+        text("""
+            UPDATE core.contact_report_view_state
+            SET core_rows = core_rows + :delta, version = version + :bump
+            WHERE matview = :mv AND core_rows IS NOT NULL
+            RETURNING core_rows
+        """),
+        params,
+    ).scalar()
+    if total_rows is None:
+        total_rows = conn.execute(text("SELECT COUNT(*) FROM core.contacts_report")).scalar()
+        conn.execute(
+            text("""
+                INSERT INTO core.contact_report_view_state (matview, version, core_rows)
+                VALUES (:mv, :bump, :rows)
+                ON CONFLICT (matview) DO UPDATE
+                SET core_rows = EXCLUDED.core_rows,
+                    version = core.contact_report_view_state.version + EXCLUDED.version
+            """),
+            {**params, "rows": total_rows},
+        )
+    return total_rows
+
+
+def refresh_report_view():
+    """REFRESH the report view if a sync changed core since its last successful refresh.
+
+    CONCURRENTLY (readers not blocked) when it has a usable unique index,
+    falling back to a plain refresh if that fails.
+    """
+    with engine.begin() as conn:
+        pending = conn.execute(
+            text("""
+                SELECT version FROM core.contact_report_view_state
+                WHERE matview = :mv AND version > refreshed_version
+            """),
+            {"mv": MATVIEW},
+        ).scalar()
+    if pending is None:
+        return
+
+    with timer("mv_refresh"), engine.begin() as conn:
+        concurrently = conn.execute(
+            text("""
+                SELECT EXISTS (
+                    SELECT 1 FROM pg_index
+                    WHERE indrelid = CAST(:mv AS regclass)
+                      AND indisunique AND indisvalid
+                      AND indpred IS NULL AND indexprs IS NULL
+                )
+            """),
+            {"mv": MATVIEW},
+        ).scalar()
+        if concurrently:
+            try:
+                with conn.begin_nested():
+                    conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {MATVIEW}"))
+            except DBAPIError as e:
+                print(f"[transform] REFRESH CONCURRENTLY de {MATVIEW} falló, refresh normal: {e.orig}")
+                concurrently = False
+        if not concurrently:
+            conn.execute(text(f"REFRESH MATERIALIZED VIEW {MATVIEW}"))
+
+        # Only what this refresh saw: a sync committed meanwhile keeps the view pending
+        conn.execute(
+            text("""
+                UPDATE core.contact_report_view_state
+                SET refreshed_version = GREATEST(refreshed_version, :seen), refreshed_at = now()
+                WHERE matview = :mv
+            """),
+            {"mv": MATVIEW, "seen": pending},
+        )
+    print(f"[transform] Materialized view refreshed{' (concurrently)' if concurrently else ''}")
+
+
+def _sync_clients(conn, clients: list[str], counts: dict):
+    """Apply the delete/update/insert delta for `clients`, accumulating into `counts`."""
+    params = {"clients": clients}
+
+    # 1. Staged rows of the changed clients whose (client, email) is unique in
+    # the export, and the rest (email-less or repeated), numbered per identical copy
+    conn.execute(text("""
+        CREATE TEMP TABLE _staged ON COMMIT DROP AS
+        SELECT s.*, COUNT(*) OVER (PARTITION BY client, email) AS copies
+        FROM staging.contacts_report s
+        WHERE client = ANY(:clients)
+    """), params)
+    conn.execute(text("""
+        CREATE TEMP TABLE _incoming ON COMMIT DROP AS
+        SELECT
+            reply_id,
+            email,
+            split_part(email, '@', 2) AS domain,
+            first_name,
+            last_name,
+            company,
+            adding_date,
+            client
+        FROM _staged
+        WHERE email IS NOT NULL AND copies = 1
+    """))
+    conn.execute(text("CREATE INDEX ON _incoming (client, email)"))
+    conn.execute(text(f"""
+        CREATE TEMP TABLE _unkeyed ON COMMIT DROP AS
+        SELECT *, ROW_NUMBER() OVER (PARTITION BY client, h) AS n
+        FROM (
+            SELECT reply_id, email, first_name, last_name, company, adding_date, client,
+                   {_ROW_HASH} AS h
+            FROM _staged
+            WHERE email IS NULL OR copies > 1
+        ) u
+    """))
+    conn.execute(text("CREATE INDEX ON _unkeyed (client, h, n)"))
+
+    # 2. Delete core rows not keyed by _incoming that have no identical staged
+    # copy left (gone emails, changed email-less rows, surplus repeats), then
+    # extra copies of keyed rows left by an earlier export
+    result = conn.execute(text(f"""
+        DELETE FROM core.contacts_report c
+        USING ({_CORE_UNKEYED}) r
+        WHERE c.tableoid = r.part AND c.ctid = r.row_id
+          AND NOT EXISTS (
+              SELECT 1 FROM _unkeyed u
+              WHERE u.client = r.client AND u.h = r.h AND u.n = r.n
+          )
+    """), params)
+    counts["deleted"] += result.rowcount
+
+    result = conn.execute(text("""
+        DELETE FROM core.contacts_report a
+        USING core.contacts_report b, _incoming i
+        WHERE a.client = ANY(:clients)
+          AND a.client = b.client
+          AND a.email = b.email
+          AND a.ctid > b.ctid
+          AND i.client = a.client
+          AND i.email = a.email
+    """), params)
+    counts["deleted"] += result.rowcount
+
+    # 3. Update rows whose values changed
+    result = conn.execute(text("""
+        UPDATE core.contacts_report c
+        SET reply_id = i.reply_id,
+            domain = i.domain,
+            first_name = i.first_name,
+            last_name = i.last_name,
+            company = i.company,
+            adding_date = i.adding_date
+        FROM _incoming i
+        WHERE c.client = i.client
+          AND c.email = i.email
+          AND (c.reply_id, c.domain, c.first_name, c.last_name, c.company, c.adding_date)
+              IS DISTINCT FROM
+              (i.reply_id, i.domain, i.first_name, i.last_name, i.company, i.adding_date)
+    """))
+    counts["updated"] += result.rowcount
+
+    # 4. Insert new keyed rows, and staged copies core doesn't hold yet
+    result = conn.execute(text(f"""
+        INSERT INTO core.contacts_report ({_CORE_COLUMNS})
+        SELECT {_CORE_COLUMNS}
+        FROM _incoming i
+        WHERE NOT EXISTS (
+            SELECT 1 FROM core.contacts_report c
+            WHERE c.client = i.client AND c.email = i.email
+        )
+    """))
+    counts["inserted"] += result.rowcount
+
+    result = conn.execute(text(f"""
+        INSERT INTO core.contacts_report ({_CORE_COLUMNS})
+        SELECT
+            reply_id,
+            email,
+            split_part(email, '@', 2) AS domain,
+            first_name,
+            last_name,
+            company,
+            adding_date,
+            client
+        FROM _unkeyed u
+        WHERE NOT EXISTS (
+            SELECT 1 FROM ({_CORE_UNKEYED}) r
+            WHERE r.client = u.client AND r.h = u.h AND r.n = u.n
+        )
+    """), params)
+    counts["inserted"] += result.rowcount
@@ -0,0 +1,87 @@
+"""In-process cache of serialized API responses, with strong ETags.
+
+Entries are kept in LRU order and evicted by total body size. Invalidation is
+driven by the logger's NOTIFY (see app.live), so a cached response is dropped
+as soon as new log rows are written for its run.
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+
+class ResponseCache:
+    """LRU of key → (body, etag, expires_at), bounded by `max_bytes` of bodies."""
+
+    def __init__(self, max_bytes: int, ttl: float | None = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # Bumped by every invalidation; a put() computed before one is discarded
+        self.generation = 0
+        self._entries: OrderedDict[str, tuple[bytes, str, float | None]] = OrderedDict()
+
+    def get(self, key: str) -> tuple[bytes, str] | None:
+        entry = self._entries.get(key)
+        if entry is None or (entry[2] is not None and entry[2] < time.monotonic()):
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0], entry[1]
+
+    def put(self, key: str, body: bytes, etag: str, generation: int):
+        if generation != self.generation or len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._entries[key] = (body, etag, expires_at)
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def invalidate(self, prefix: str = ""):
+        """Drop every entry whose key starts with `prefix` (all of them by default)."""
+        self.generation += 1
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            self._drop(key)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _drop(self, key: str):
+        body, _, _ = self._entries.pop(key)
+        self.size -= len(body)
+
+
+def encode(payload) -> tuple[bytes, str]:
+    """JSON body and its strong ETag (hash of the exact bytes sent)."""
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_response(request: Request, body: bytes, etag: str, cache_control: str) -> Response:
+    """200 with the body, or 304 when the client already holds this ETag."""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    tags = _parse_if_none_match(request.headers.get("if-none-match", ""))
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _parse_if_none_match(value: str) -> set[str]:
+    # If-None-Match uses weak comparison: W/"x" matches our strong "x"
+    return {tag.strip().removeprefix("W/") for tag in value.split(",") if tag.strip()}
@@ -0,0 +1,113 @@
+"""Shared Chromium processes for the whole run, handing out one context per account."""
+import asyncio
+import time
+
+from playwright.async_api import async_playwright
+
+from app.config import BROWSER_POOL_SIZE
+from app.metrics import BROWSER_LAUNCHES
+
+
+class BrowserPool:
+    """
+    Launches at most `size` Chromium instances and spreads new contexts across
+    them round-robin. A browser that crashed or disconnected is relaunched the
+    next time its slot is used.
+
+    Usage:
+        async with BrowserPool(proxy_url=...) as pool:
+            context = await pool.new_context(**context_opts)
+    """
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, headless: bool = True, proxy_url: str | None = None):
+        self.size = max(1, size)
+        self.headless = headless
+        self.proxy_url = proxy_url
+        self._playwright = None
+        self._browsers = [None] * self.size
+        self._next = 0
+        self._lock = asyncio.Lock()
+        self.launch_count = 0
+        self.launch_seconds = 0.0
+        self.crash_count = 0
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        self._playwright = await async_playwright().start()
+
+    async def close(self):
+        for browser in self._browsers:
+            if browser is not None and browser.is_connected():
+                try:
+                    await browser.close()
+                except Exception as e:
+                    print(f"[browser_pool] Error cerrando navegador: {e}")
+        self._browsers = [None] * self.size
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        print(
+            f"[browser_pool] Cerrado — {self.launch_count} lanzamientos en "
+            f"{self.launch_seconds:.1f}s, {self.crash_count} navegadores reemplazados"
+        )
+
+    async def new_context(self, **context_opts):
+        """Open an isolated BrowserContext on a healthy pooled browser."""
+        browser = await self._acquire_browser()
+        try:
+            return await browser.new_context(**context_opts)
+        except Exception:
+            if browser.is_connected():
+                raise
+            # Died between the health check and use — relaunch once
+            browser = await self._acquire_browser()
+            return await browser.new_context(**context_opts)
+
+    @staticmethod
+    def is_alive(context) -> bool:
+        """Health check for a context handed out by the pool."""
+        browser = context.browser
+        return browser is not None and browser.is_connected()
+
+    def stats(self) -> dict:
+        return {
+            "browsers": self.size,
+            "launches": self.launch_count,
+            "launch_seconds": round(self.launch_seconds, 2),
+            "replaced": self.crash_count,
+        }
+
+    async def _acquire_browser(self):
+        async with self._lock:
+            slot = self._next % self.size
+            self._next += 1
+
+            browser = self._browsers[slot]
+            if browser is not None and browser.is_connected():
+                return browser
+
+            if browser is not None:
+                self.crash_count += 1
+                print(f"[browser_pool] Navegador {slot} caído, relanzando...")
+
+            browser = await self._launch()
+            self._browsers[slot] = browser
+            return browser
+
+    async def _launch(self):
+        launch_opts = {"headless": self.headless}
+        if self.proxy_url:
+            launch_opts["proxy"] = {"server": self.proxy_url}
+
+        started = time.perf_counter()
+        browser = await self._playwright.chromium.launch(**launch_opts)
+        self.launch_seconds += time.perf_counter() - started
+        self.launch_count += 1
+        BROWSER_LAUNCHES.inc()
+        return browser
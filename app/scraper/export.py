@@ -0,0 +1,66 @@
+"""Export one workspace's People CSV: HTTP fast path first, browser flow as fallback."""
+import time
+from pathlib import Path
+
+from app.scraper.browser_pool import BrowserPool
+from app.scraper.http_export import HttpExporter
+from app.scraper.reply_io import context_options, download_contacts_csv
+
+
+async def export_workspace(
+    pool: BrowserPool,
+    exporter: HttpExporter,
+    context,
+    email: str,
+    password: str,
+    cookies: str | None,
+    team_id: int,
+    download_dir: Path,
+    timings: dict,
+):
+    """Download `team_id`'s CSV with the account's session.
+
+    `context` is the account's BrowserContext (or None); it's (re)opened only if
+    the browser flow is needed and it's missing or its browser crashed.
+    Returns (csv_path, updated_cookies or None, login_status, context).
+    """
+    csv_path = await http_export(exporter, cookies, team_id, download_dir, timings)
+    if csv_path is not None:
+        return csv_path, None, "login_skipped", context
+
+    if context is None or not pool.is_alive(context):
+        context = await pool.new_context(**context_options(email, cookies))
+
+    csv_path, updated_cookies, login_status = await download_contacts_csv(
+        email=email,
+        password=password,
+        team_id=team_id,
+        download_dir=download_dir,
+        context=context,
+        timings=timings,
+    )
+    return csv_path, updated_cookies, login_status, context
+
+
+async def http_export(
+    exporter: HttpExporter, cookies: str | None, team_id: int, download_dir: Path, timings: dict,
+) -> Path | None:
+    """Try the HTTP export with the session cookies. None means: use the browser flow."""
+    if not exporter.enabled or not cookies:
+        return None
+
+    started = time.perf_counter()
+    try:
+        return await exporter.download(cookies, team_id, download_dir / "people.csv")
+    except Exception as e:
+        print(f"[extract] Export HTTP falló ({e}), usando navegador")
+        return None
+    finally:
+        timings["http_export"] = round(time.perf_counter() - started, 2)
+
+
+async def close_context(context):
+    try:
+        await context.close()
+    except Exception:
+        pass  # browser already gone
@@ -0,0 +1,115 @@
+"""Direct HTTP export of the People CSV, reusing a Playwright session's cookies."""
+import json
+from pathlib import Path
+from urllib.parse import urlparse
+
+import httpx
+
+from app.config import REPLY_BASE_URL, REPLY_EXPORT_PATH
+
+
+class SessionExpired(Exception):
+    """The cookies no longer authenticate — the browser flow has to log in again."""
+
+
+class HttpExporter:
+    """
+    Pooled async HTTP client for the CSV export endpoint.
+
+    One instance is shared by the whole run. Cookies are passed per account
+    on each request (never stored on the client), so sessions don't leak
+    between accounts.
+    """
+
+    def __init__(
+        self,
+        base_url: str = REPLY_BASE_URL,
+        export_path: str = REPLY_EXPORT_PATH,
+        proxy_url: str | None = None,
+        max_connections: int = 10,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.base_url = base_url
+        self.export_path = export_path
+        self._host = urlparse(base_url).hostname or ""
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            proxy=proxy_url,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(30.0, read=300.0),
+            follow_redirects=False,
+            transport=transport,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.export_path)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def download(self, storage_state_json: str, team_id: int, dest: Path) -> Path:
+        """Switch to `team_id` and stream the export to `dest`.
+
+        Raises SessionExpired when redirected to login, httpx.HTTPError otherwise.
+        """
+        cookies = self._cookies_from_state(storage_state_json)
+
+        # Same endpoint the browser hits; the active team is kept server-side / in cookies
+        resp = await self._client.get(
+            "/Home/SwitchTeam",
+            params={"teamId": team_id},
+            headers={"Cookie": self._cookie_header(cookies)},
+        )
+        self._check_auth(resp)
+        cookies.update(resp.cookies)
+
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_suffix(dest.suffix + ".part")
+        size = 0
+        try:
+            async with self._client.stream(
+                "GET",
+                self.export_path.format(team_id=team_id),
+                headers={"Cookie": self._cookie_header(cookies)},
+            ) as resp:
+                self._check_auth(resp)
+                resp.raise_for_status()
+                if "text/html" in resp.headers.get("content-type", ""):
+                    raise SessionExpired("export devolvió HTML en lugar de CSV")
+
+                with open(tmp, "wb") as f:
+                    async for block in resp.aiter_bytes(1 << 16):
+                        f.write(block)
+                        size += len(block)
+
+            tmp.replace(dest)
+        finally:
+            # Left behind only when the download failed part-way
+            tmp.unlink(missing_ok=True)
+        print(f"[http_export] people.csv descargado vía HTTP: {size:,} bytes")
+        return dest
+
+    def _cookies_from_state(self, storage_state_json: str) -> dict:
+        state = json.loads(storage_state_json)
+        return {
+            c["name"]: c["value"]
+            for c in state.get("cookies", [])
+            if self._host.endswith(c.get("domain", "").lstrip("."))
+        }
+
+    @staticmethod
+    def _cookie_header(cookies: dict) -> str:
+        return "; ".join(f"{k}={v}" for k, v in cookies.items())
+
+    @staticmethod
+    def _check_auth(resp: httpx.Response):
+        location = resp.headers.get("location", "")
+        if resp.status_code in (401, 403) or "login" in location.lower() or "oauth" in location:
+            raise SessionExpired(f"sesión expirada ({resp.status_code} {location})")
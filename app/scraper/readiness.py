@@ -0,0 +1,79 @@
+"""Event-driven readiness waits for the Reply.io UI (instead of fixed sleeps)."""
+import asyncio
+import re
+import time
+from contextlib import asynccontextmanager
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+
+@asynccontextmanager
+async def ui_step(
+    page,
+    name: str,
+    timings: dict | None = None,
+    *,
+    selector: str | None = None,
+    url=None,
+    load_state: str | None = None,
+    response: str | None = None,
+    timeout: int = 10_000,
+    fallback: float = 0,
+):
+    """
+    Run the wrapped action, then wait for the page to signal it's ready.
+
+    Signals, checked in this order and sharing one `timeout` (ms):
+      response   — URL substring or /regex/ of an XHR; armed before the action
+      url        — glob/regex/predicate accepted by page.wait_for_url
+      load_state — 'load' | 'domcontentloaded' | 'networkidle'
+      selector   — first match becomes visible
+
+    If a signal doesn't arrive in time the step doesn't fail: it sleeps
+    `fallback` seconds and the flow continues (Playwright's own actionability
+    checks still guard the next click). Elapsed seconds go to timings[name].
+    """
+    started = time.perf_counter()
+    deadline = started + timeout / 1000
+
+    response_task = None
+    if response is not None:
+        response_task = asyncio.ensure_future(
+            page.wait_for_response(_response_matcher(response), timeout=timeout)
+        )
+
+    try:
+        yield
+
+        try:
+            if response_task is not None:
+                await response_task
+            if url is not None:
+                await page.wait_for_url(url, timeout=_remaining_ms(deadline))
+            if load_state is not None:
+                await page.wait_for_load_state(load_state, timeout=_remaining_ms(deadline))
+            if selector is not None:
+                await page.locator(selector).first.wait_for(
+                    state="visible", timeout=_remaining_ms(deadline),
+                )
+        except PlaywrightTimeoutError:
+            print(f"[readiness] {name}: sin señal tras {timeout / 1000:.0f}s, continuando")
+            if fallback:
+                await asyncio.sleep(fallback)
+    finally:
+        if response_task is not None and not response_task.done():
+            response_task.cancel()
+        if timings is not None:
+            timings[name] = round(time.perf_counter() - started, 2)
+
+
+def _response_matcher(pattern: str):
+    if pattern.startswith("/") and pattern.endswith("/") and len(pattern) > 1:
+        regex = re.compile(pattern[1:-1])
+        return lambda r: bool(regex.search(r.url))
+    return lambda r: pattern in r.url
+
+
+def _remaining_ms(deadline: float) -> int:
+    # Playwright treats 0 as "no timeout", so never go below 1 ms
+    return max(1, int((deadline - time.perf_counter()) * 1000))
@@ -1,13 +1,40 @@
 """Playwright scraper for Reply.io — downloads People (contacts) CSV with cookie support."""
-import asyncio
 import json
 from pathlib import Path
 
 from playwright.async_api import async_playwright
 
+from app.config import REPLY_BASE_URL
+from app.scraper.readiness import ui_step
 from app.utils.rate_limit import random_user_agent, random_viewport
 
 
+class LoginFailed(Exception):
+    """Reply.io kept us on the login page after submitting the credentials."""
+
+
+def context_options(email: str, cookies_json: str | None = None) -> dict:
+    """BrowserContext options: anti-fingerprinting + saved cookies when available."""
+    # Anti-fingerprinting: random UA + viewport + timezone
+    context_opts = {
+        "viewport": random_viewport(),
+        "user_agent": random_user_agent(),
+        "timezone_id": "America/Lima",
+        "accept_downloads": True,
+    }
+
+    # Load cookies if available
+    if cookies_json:
+        try:
+            storage_state = json.loads(cookies_json)
+            context_opts["storage_state"] = storage_state
+            print(f"[scraper] Cargando cookies para {email}")
+        except (json.JSONDecodeError, TypeError):
+            print(f"[scraper] Cookies inválidas para {email}, haciendo login")
+
+    return context_opts
+
+
 async def download_contacts_csv(
     email: str,
     password: str,
@@ -16,89 +43,99 @@ async def download_contacts_csv(
     cookies_json: str | None = None,
     headless: bool = True,
     proxy_url: str | None = None,
+    context=None,
+    timings: dict | None = None,
 ) -> tuple[Path, str | None, str]:
     """
     Download the People CSV (Basic fields) from a Reply.io workspace.
 
     Uses cookies when available to skip login (anti-detection).
+    When `context` is given (from a BrowserPool), the workspace is scraped in a
+    new page of that context and the browser is left running; cookies_json,
+    headless and proxy_url are then ignored.
+    When `timings` is given it's filled with seconds spent per UI step.
     Returns: (csv_path, updated_cookies_json or None, login_status)
     login_status: 'login_done' | 'login_skipped'
     """
     download_dir.mkdir(parents=True, exist_ok=True)
 
+    if context is not None:
+        return await _scrape_workspace(context, email, password, team_id, download_dir, timings)
+
     async with async_playwright() as p:
         launch_opts = {"headless": headless}
         if proxy_url:
             launch_opts["proxy"] = {"server": proxy_url}
 
         browser = await p.chromium.launch(**launch_opts)
+        try:
+            context = await browser.new_context(**context_options(email, cookies_json))
+            return await _scrape_workspace(context, email, password, team_id, download_dir, timings)
+        finally:
+            await browser.close()
 
-        # Anti-fingerprinting: random UA + viewport + timezone
-        context_opts = {
-            "viewport": random_viewport(),
-            "user_agent": random_user_agent(),
-            "timezone_id": "America/Lima",
-            "accept_downloads": True,
-        }
-
-        # Load cookies if available
-        if cookies_json:
-            try:
-                storage_state = json.loads(cookies_json)
-                context_opts["storage_state"] = storage_state
-                print(f"[scraper] Cargando cookies para {email}")
-            except (json.JSONDecodeError, TypeError):
-                print(f"[scraper] Cookies inválidas para {email}, haciendo login")
-
-        context = await browser.new_context(**context_opts)
-        page = await context.new_page()
 
-        # Navigate — cookies should keep us logged in
-        await page.goto("https://run.reply.io/", wait_until="domcontentloaded", timeout=30_000)
-        await asyncio.sleep(3)
+async def _scrape_workspace(
+    context, email: str, password: str, team_id: int, download_dir: Path,
+    timings: dict | None = None,
+) -> tuple[Path, str | None, str]:
+    """Login if needed, switch to `team_id` and export People, in a fresh page."""
+    page = await context.new_page()
+    try:
+        # Navigate — cookies should keep us logged in (wait for any login redirect)
+        async with ui_step(page, "home", timings, load_state="networkidle", timeout=6_000):
+            await page.goto(f"{REPLY_BASE_URL}/", wait_until="domcontentloaded", timeout=30_000)
 
         # Check if we need to login
         needs_login = "oauth" in page.url or "login" in page.url.lower()
         login_status = "login_skipped"
         if needs_login:
             print(f"[scraper] Login requerido para {email}")
-            await _do_login(page, email, password)
+            await _do_login(page, email, password, timings)
             login_status = "login_done"
 
         # Switch workspace
         print(f"[scraper] Cambiando a workspace {team_id}...")
-        await page.goto(
-            f"https://run.reply.io/Home/SwitchTeam?teamId={team_id}",
-            wait_until="domcontentloaded",
-            timeout=30_000,
-        )
-        await asyncio.sleep(8)
+        async with ui_step(page, "switch_team", timings, load_state="networkidle", timeout=12_000):
+            await page.goto(
+                f"{REPLY_BASE_URL}/Home/SwitchTeam?teamId={team_id}",
+                wait_until="domcontentloaded",
+                timeout=30_000,
+            )
 
         # Download People CSV
-        csv_path = await _download_people_csv(page, download_dir)
-
-        # Save updated cookies
-        updated_cookies = None
+        csv_path = await _download_people_csv(page, download_dir, timings)
+    finally:
         try:
-            storage = await context.storage_state()
-            updated_cookies = json.dumps(storage)
-        except Exception as e:
-            print(f"[scraper] No se pudieron guardar cookies: {e}")
+            await page.close()
+        except Exception:
+            pass  # browser already gone
+
+    # Save updated cookies
+    updated_cookies = None
+    try:
+        storage = await context.storage_state()
+        updated_cookies = json.dumps(storage)
+    except Exception as e:
+        print(f"[scraper] No se pudieron guardar cookies: {e}")
 
-        await browser.close()
-        return csv_path, updated_cookies, login_status
+    return csv_path, updated_cookies, login_status
 
 
-async def _do_login(page, email: str, password: str):
+async def _do_login(page, email: str, password: str, timings: dict | None = None):
     """Perform email/password login on Reply.io."""
     await page.locator("input:visible").first.fill(email)
     await page.locator('input[type="password"]:visible').fill(password)
-    await page.get_by_role("button", name="Sign in").click(no_wait_after=True)
-    try:
-        await page.wait_for_url("**/run.reply.io/**", timeout=30_000)
-    except Exception:
-        pass
-    await asyncio.sleep(5)
+    async with ui_step(
+        page, "login", timings,
+        url=lambda u: u.startswith(REPLY_BASE_URL) and "login" not in u.lower() and "oauth" not in u,
+        load_state="networkidle",
+        timeout=30_000,
+    ):
+        await page.get_by_role("button", name="Sign in").click(no_wait_after=True)
+
+    if "oauth" in page.url or "login" in page.url.lower():
+        raise LoginFailed(f"login rechazado para {email}")
 
 
 async def _clear_overlays(page):
@@ -124,45 +161,52 @@ async def _clear_overlays(page):
     }""")
 
 
-async def _download_people_csv(page, download_dir: Path) -> Path:
-    """People > All tab > Select All in list > More > Export to CSV > Basic fields."""
+async def _download_people_csv(page, download_dir: Path, timings: dict | None = None) -> Path:
+    """People > All tab > Select All in list > More > Export to CSV > Basic fields.
 
-    await page.goto(
-        "https://run.reply.io/Dashboard/Material#/people/list",
-        wait_until="domcontentloaded",
-        timeout=30_000,
-    )
-    await asyncio.sleep(5)
+    Each click waits for the element the next step needs instead of a fixed sleep.
+    """
+    all_tab = 'text=/^All\\s*\\(/'
+    select_control = '[data-test-id="select-control-button"]'
+    more_button = 'button:has-text("More"):visible'
+
+    async with ui_step(page, "people_list", timings, selector=all_tab, timeout=15_000, fallback=2):
+        await page.goto(
+            f"{REPLY_BASE_URL}/Dashboard/Material#/people/list",
+            wait_until="domcontentloaded",
+            timeout=30_000,
+        )
 
     # Remove overlays that block clicks (Intercom, modals, banners, etc.)
     await _clear_overlays(page)
 
     # Click "All" tab
-    await page.locator('text=/^All\\s*\\(/').first.click(force=True)
-    await asyncio.sleep(2)
+    async with ui_step(page, "all_tab", timings, selector=select_control, timeout=5_000, fallback=1):
+        await page.locator(all_tab).first.click(force=True)
 
     # Click the select-control-button dropdown
-    await page.locator('[data-test-id="select-control-button"]').click(force=True)
-    await asyncio.sleep(1)
+    async with ui_step(page, "select_menu", timings, selector="text=All in list", timeout=3_000):
+        await page.locator(select_control).click(force=True)
 
-    # Click "All in list"
-    await page.locator("text=All in list").first.click(force=True)
-    await asyncio.sleep(2)
+    # Click "All in list" — More becomes enabled once the selection is applied
+    async with ui_step(page, "select_all", timings, selector=f"{more_button}:enabled", timeout=5_000, fallback=1):
+        await page.locator("text=All in list").first.click(force=True)
 
     # Click "More" dropdown
-    await page.locator('button:has-text("More"):visible').first.click(force=True)
-    await asyncio.sleep(1)
+    async with ui_step(page, "more_menu", timings, selector="text=Export to CSV", timeout=3_000):
+        await page.locator(more_button).first.click(force=True)
 
     # Hover "Export to CSV"
-    await page.locator("text=Export to CSV").hover(force=True)
-    await asyncio.sleep(1)
+    async with ui_step(page, "export_menu", timings, selector="text=/^Basic fields$/", timeout=3_000):
+        await page.locator("text=Export to CSV").hover(force=True)
 
     # Click "Basic fields" — triggers download
-    async with page.expect_download(timeout=60_000) as download_info:
-        await page.locator("text=/^Basic fields$/").first.click(force=True)
+    async with ui_step(page, "download", timings):
+        async with page.expect_download(timeout=60_000) as download_info:
+            await page.locator("text=/^Basic fields$/").first.click(force=True)
 
-    download = await download_info.value
-    dest = download_dir / "people.csv"
-    await download.save_as(str(dest))
+        download = await download_info.value
+        dest = download_dir / "people.csv"
+        await download.save_as(str(dest))
     print(f"[scraper] people.csv descargado: {dest.stat().st_size:,} bytes")
     return dest
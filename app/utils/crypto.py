@@ -18,6 +18,13 @@ def decrypt(ciphertext: str) -> str:
     return _fernet.decrypt(ciphertext.encode()).decode()
 
 
+def decrypt_bytes(ciphertext: str) -> bytes:
+    """Like decrypt(), without the str copy (for callers that zeroize secrets)."""
+    if not _fernet:
+        raise RuntimeError("FERNET_KEY no configurada")
+    return _fernet.decrypt(ciphertext.encode())
+
+
 def generate_key() -> str:
     """Generate a new Fernet key (use once, save to .env)."""
     return Fernet.generate_key().decode()
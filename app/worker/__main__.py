@@ -0,0 +1,10 @@
+import asyncio
+import sys
+
+from app.pipeline.logger import install_exit_handlers
+from app.worker.runner import run_worker
+
+# Guarded: spawned child processes (e.g. the credential pool) re-import __main__
+if __name__ == "__main__":
+    install_exit_handlers()
+    asyncio.run(run_worker(once="--once" in sys.argv))
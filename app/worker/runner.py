@@ -0,0 +1,98 @@
+"""Worker loop: claim shards, scrape them with a heartbeat, finalize finished runs.
+
+Start any number of these, on one host or in separate containers:
+    python3 -m app.worker          # keep polling for shards
+    python3 -m app.worker --once   # exit when the queue is empty
+"""
+import asyncio
+import os
+import socket
+
+from prometheus_client import start_http_server
+
+from app.config import SHARD_HEARTBEAT_SECONDS, WORKER_METRICS_PORT, WORKER_POLL_SECONDS
+from app.pipeline.clients import get_active_clients
+from app.pipeline.extract import finish_run, scrape_clients
+from app.pipeline.logger import flush_events, log_event
+from app.worker.shards import claim_shard, complete_shard, fail_shard, heartbeat, try_finalize
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def run_worker(once: bool = False):
+    wid = worker_id()
+    if WORKER_METRICS_PORT:
+        start_http_server(WORKER_METRICS_PORT)
+        print(f"[worker] Métricas en http://0.0.0.0:{WORKER_METRICS_PORT}/metrics")
+    print(f"[worker] {wid} esperando shards")
+
+    while True:
+        shard, abandoned = await asyncio.to_thread(claim_shard, wid)
+        for run_id in abandoned:
+            await _finalize(run_id)
+
+        if shard is None:
+            if once:
+                print("[worker] Cola vacía, saliendo")
+                return
+            await asyncio.sleep(WORKER_POLL_SECONDS)
+            continue
+
+        run_id = shard[0]
+        await _run_shard(wid, *shard)
+        await _finalize(run_id)
+
+
+async def _run_shard(wid: str, run_id: str, shard_no: int, emails: list[str], attempt: int):
+    shard = {"shard": shard_no, "worker": wid, "attempt": attempt}
+    wanted = set(emails)
+    clients = [c for c in await asyncio.to_thread(get_active_clients) if c["email"] in wanted]
+    log_event(run_id, "shard_started", rows_count=len(clients), details=shard)
+
+    scrape = asyncio.create_task(scrape_clients(run_id, clients))
+    lost = asyncio.Event()
+    beat = asyncio.create_task(_heartbeat(run_id, shard_no, wid, scrape, lost))
+    try:
+        loaded_clients = await scrape
+    except asyncio.CancelledError:
+        if not lost.is_set():
+            raise
+        print(f"[worker] Shard {shard_no} de {run_id} tomado por otro worker, abandonando")
+        log_event(run_id, "shard_failed", details={**shard, "error": "heartbeat perdido"})
+    except Exception as e:
+        print(f"[worker] Shard {shard_no} de {run_id} falló: {e}")
+        await asyncio.to_thread(fail_shard, run_id, shard_no, wid, str(e))
+        log_event(run_id, "shard_failed", details={**shard, "error": str(e)})
+    else:
+        if await asyncio.to_thread(complete_shard, run_id, shard_no, wid, loaded_clients):
+            log_event(run_id, "shard_done", rows_count=len(loaded_clients), details=shard)
+    finally:
+        beat.cancel()
+        await asyncio.to_thread(flush_events)
+
+
+async def _heartbeat(run_id: str, shard_no: int, wid: str, scrape: asyncio.Task, lost: asyncio.Event):
+    while True:
+        await asyncio.sleep(SHARD_HEARTBEAT_SECONDS)
+        try:
+            owned = await asyncio.to_thread(heartbeat, run_id, shard_no, wid)
+        except Exception as e:
+            print(f"[worker] Error en heartbeat: {e}")
+            continue
+        if not owned:
+            lost.set()
+            scrape.cancel()
+            return
+
+
+async def _finalize(run_id: str):
+    """Run the transform if this worker is the one that closes the run."""
+    loaded_clients = await asyncio.to_thread(try_finalize, run_id)
+    if loaded_clients is None:
+        return
+    print(f"[worker] Todos los shards de {run_id} terminados, ejecutando transform")
+    await asyncio.to_thread(finish_run, run_id, loaded_clients)
+    await asyncio.to_thread(flush_events)
+    print(f"[worker] Pipeline {run_id} completado")
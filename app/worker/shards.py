@@ -0,0 +1,186 @@
+"""Postgres-backed shard queue for sharded runs.
+
+A coordinator splits a run's accounts into rows of core.contact_report_run_shards.
+Workers claim them with FOR UPDATE SKIP LOCKED and keep a heartbeat while
+scraping; a shard whose heartbeat goes stale is claimed again by another
+worker (up to SHARD_MAX_ATTEMPTS). When no shard of a run is pending or
+running, exactly one worker wins try_finalize() and runs the transform.
+"""
+from collections import defaultdict
+
+from sqlalchemy import text
+
+from app.config import PIPELINE_SHARDS, SHARD_MAX_ATTEMPTS, SHARD_STALE_SECONDS
+from app.db import engine
+from app.pipeline.clients import get_active_clients
+from app.pipeline.logger import flush_events, log_event, new_run_id
+from app.pipeline.scheduler import split_into_shards, workspace_estimates
+
+_GIVE_UP = """
+    UPDATE core.contact_report_run_shards
+    SET status = 'failed', error_message = 'heartbeat perdido', updated_at = now()
+    WHERE status = 'running'
+      AND heartbeat_at < now() - make_interval(secs => :stale_seconds)
+      AND attempts >= :max_attempts
+    RETURNING run_id, shard_no
+"""
+
+_CLAIM = """
+    UPDATE core.contact_report_run_shards s
+    SET status = 'running',
+        worker_id = :worker_id,
+        attempts = s.attempts + 1,
+        heartbeat_at = now(),
+        error_message = NULL,
+        updated_at = now()
+    FROM (
+        SELECT run_id, shard_no
+        FROM core.contact_report_run_shards
+        WHERE (status = 'pending'
+               OR (status = 'running' AND heartbeat_at < now() - make_interval(secs => :stale_seconds)))
+          AND attempts < :max_attempts
+        ORDER BY created_at, shard_no
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    ) c
+    WHERE s.run_id = c.run_id AND s.shard_no = c.shard_no
+    RETURNING s.run_id, s.shard_no, s.emails, s.attempts
+"""
+
+# Only the current owner may touch a running shard
+_OWNED = """
+    run_id = CAST(:run_id AS uuid) AND shard_no = :shard_no
+    AND worker_id = :worker_id AND status = 'running'
+"""
+
+
+def create_sharded_run(shards: int = PIPELINE_SHARDS) -> str | None:
+    """Coordinator: start a run and enqueue its accounts as `shards` balanced shards."""
+    run_id = new_run_id()
+    log_event(run_id, "pipeline_started")
+    print(f"[shards] Pipeline iniciado (run_id={run_id})")
+
+    clients = get_active_clients()
+    if not clients:
+        print("[shards] No hay clientes con credenciales y team_id")
+        log_event(run_id, "pipeline_completed", rows_count=0)
+        flush_events()
+        return None
+
+    accounts = defaultdict(list)
+    for client in clients:
+        accounts[client["email"]].append(client)
+    groups = split_into_shards(accounts, workspace_estimates([c["id"] for c in clients]), shards)
+
+    with engine.begin() as conn:
+        conn.execute(
+            text("""
+                INSERT INTO core.contact_report_sharded_runs (run_id, shards)
+                VALUES (CAST(:run_id AS uuid), :shards)
+            """),
+            {"run_id": run_id, "shards": len(groups)},
+        )
+        conn.execute(
+            text("""
+                INSERT INTO core.contact_report_run_shards (run_id, shard_no, emails)
+                VALUES (CAST(:run_id AS uuid), :shard_no, :emails)
+            """),
+            [{"run_id": run_id, "shard_no": i, "emails": emails} for i, emails in enumerate(groups)],
+        )
+
+    log_event(run_id, "shards_created", details={
+        "shards": len(groups), "accounts": len(accounts), "clients": len(clients),
+    })
+    flush_events()
+    print(f"[shards] {len(groups)} shards en cola para {len(accounts)} cuentas")
+    return run_id
+
+
+def claim_shard(worker_id: str) -> tuple[tuple | None, list[str]]:
+    """Claim the oldest available shard.
+
+    Returns (shard, abandoned_run_ids): shard is (run_id, shard_no, emails, attempt)
+    or None; abandoned runs had a shard given up on and may now be ready to finalize.
+    """
+    params = {
+        "worker_id": worker_id,
+        "stale_seconds": SHARD_STALE_SECONDS,
+        "max_attempts": SHARD_MAX_ATTEMPTS,
+    }
+    with engine.begin() as conn:
+        abandoned = conn.execute(text(_GIVE_UP), params).fetchall()
+        row = conn.execute(text(_CLAIM), params).fetchone()
+
+    for run_id, shard_no in abandoned:
+        log_event(str(run_id), "shard_failed", details={"shard": shard_no, "error": "heartbeat perdido"})
+
+    shard = (str(row[0]), row[1], list(row[2]), row[3]) if row else None
+    return shard, sorted({str(r[0]) for r in abandoned})
+
+
+def heartbeat(run_id: str, shard_no: int, worker_id: str) -> bool:
+    """Refresh the shard's heartbeat. False means another worker took it over."""
+    with engine.begin() as conn:
+        result = conn.execute(
+            text(f"UPDATE core.contact_report_run_shards SET heartbeat_at = now() WHERE {_OWNED}"),
+            {"run_id": run_id, "shard_no": shard_no, "worker_id": worker_id},
+        )
+    return result.rowcount == 1
+
+
+def complete_shard(run_id: str, shard_no: int, worker_id: str, loaded_clients: list[str]) -> bool:
+    with engine.begin() as conn:
+        result = conn.execute(
+            text(f"""
+                UPDATE core.contact_report_run_shards
+                SET status = 'done', loaded_clients = :loaded_clients, updated_at = now()
+                WHERE {_OWNED}
+            """),
+            {"run_id": run_id, "shard_no": shard_no, "worker_id": worker_id,
+             "loaded_clients": loaded_clients},
+        )
+    return result.rowcount == 1
+
+
+def fail_shard(run_id: str, shard_no: int, worker_id: str, error: str):
+    """Put the shard back in the queue, or mark it failed once out of attempts."""
+    with engine.begin() as conn:
+        conn.execute(
+            text(f"""
+                UPDATE core.contact_report_run_shards
+                SET status = CASE WHEN attempts < :max_attempts THEN 'pending' ELSE 'failed' END,
+                    error_message = :error,
+                    updated_at = now()
+                WHERE {_OWNED}
+            """),
+            {"run_id": run_id, "shard_no": shard_no, "worker_id": worker_id,
+             "error": error, "max_attempts": SHARD_MAX_ATTEMPTS},
+        )
+
+
+def try_finalize(run_id: str) -> list[str] | None:
+    """Claim the run's transform once all shards are done or failed.
+
+    Returns the clients staged across its shards to the single winner, None to everyone else.
+    Call after the shard's own status change has committed, so the last finisher sees it.
+    """
+    with engine.begin() as conn:
+        row = conn.execute(
+            text("""
+                UPDATE core.contact_report_sharded_runs r
+                SET finalized_at = now()
+                WHERE r.run_id = CAST(:run_id AS uuid)
+                  AND r.finalized_at IS NULL
+                  AND NOT EXISTS (
+                      SELECT 1 FROM core.contact_report_run_shards s
+                      WHERE s.run_id = r.run_id AND s.status IN ('pending', 'running')
+                  )
+                RETURNING (
+                    SELECT COALESCE(array_agg(DISTINCT c), '{}')
+                    FROM core.contact_report_run_shards s, unnest(s.loaded_clients) AS c
+                    WHERE s.run_id = r.run_id
+                )
+            """),
+            {"run_id": run_id},
+        ).fetchone()
+    return list(row[0]) if row else None
@@ -0,0 +1,92 @@
+"""Synthetic Reply.io People exports (people.csv) of any size.
+
+    python3 -m benchmarks.generate_csv --rows 1000000 --clients 4 --out /tmp/bench_csv
+
+Writes <out>/<client>/people.csv, the same layout the pipeline uses under
+DOWNLOAD_DIR. Output is deterministic per team_id, so a rerun produces files
+with the same fingerprint. The mock server (tools.mock_reply_io) serves the
+same rows from its export endpoint.
+"""
+import argparse
+import csv
+import io
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+HEADER = ["Email", "First Name", "Last Name", "Account Name", "Added On", "Sequence"]
+BENCH_TEAM_BASE = 900_000
+
+
+def bench_client(i: int) -> dict:
+    """Name and team_id of the i-th synthetic client (shared by the generator, mock and runner)."""
+    return {"name": f"Bench Client {i}", "team_id": BENCH_TEAM_BASE + i}
+
+
+def client_dir(name: str) -> str:
+    return name.lower().replace(" ", "_")
+
+
+def people_rows(team_id: int, rows: int, duplicate_rate: float = 0.01, missing_email_rate: float = 0.005):
+    """Yield `rows` CSV records like a real export: some repeated emails, some without one."""
+    rng = random.Random(team_id)
+    start = datetime(2024, 1, 1)
+    for i in range(rows):
+        roll = rng.random()
+        if roll < missing_email_rate:
+            email = ""
+        elif roll < missing_email_rate + duplicate_rate and i:
+            email = f"contact{rng.randrange(i)}@company{rng.randint(1, 500)}.com"
+        else:
+            email = f"contact{i}@company{rng.randint(1, 500)}.com"
+        yield [
+            email,
+            f"First{i}",
+            f"Last{i}",
+            f"Company {i % 500}",
+            (start + timedelta(minutes=rng.randint(0, 500_000))).strftime("%m/%d/%Y %H:%M"),
+            f"Sequence {i % 7}",
+        ]
+
+
+def people_csv_chunks(team_id: int, rows: int, batch: int = 1000):
+    """Yield the CSV text (header first) in chunks of `batch` rows, for streaming responses."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(HEADER)
+    for i, record in enumerate(people_rows(team_id, rows), start=1):
+        writer.writerow(record)
+        if i % batch == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def write_people_csv(path: Path, team_id: int, rows: int) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="") as f:
+        for chunk in people_csv_chunks(team_id, rows, batch=10_000):
+            f.write(chunk)
+    return path
+
+
+def generate(out: Path, rows: int, clients: int) -> list[tuple[str, Path]]:
+    """Write one export per synthetic client. Returns [(client name, csv path)]."""
+    files = []
+    for i in range(1, clients + 1):
+        client = bench_client(i)
+        path = write_people_csv(out / client_dir(client["name"]) / "people.csv", client["team_id"], rows)
+        files.append((client["name"], path))
+    return files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera exports people.csv sintéticos")
+    parser.add_argument("--rows", type=int, default=100_000, help="filas por cliente")
+    parser.add_argument("--clients", type=int, default=1)
+    parser.add_argument("--out", type=Path, default=Path("/tmp/bench_csv"))
+    args = parser.parse_args()
+
+    for name, path in generate(args.out, args.rows, args.clients):
+        print(f"[generate_csv] {name}: {path} ({path.stat().st_size:,} bytes)")
@@ -0,0 +1,75 @@
+"""Import-time budget for the light entry points (run in CI or before a release).
+
+    python3 -m benchmarks.importtime                     # exits 1 if over budget
+    python3 -m benchmarks.importtime --budget app.api=800
+
+Each module is imported in a fresh interpreter with -X importtime. The check
+fails when the module's cumulative import time exceeds its budget, or when
+it pulls in one of the heavy dependencies it must leave to the pipeline.
+Budgets are generous on purpose: they catch a stray top-level import, not
+noise between machines.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+HEAVY = ("pandas", "playwright", "cryptography")
+
+# module → (budget in ms, heavy dependencies it must not import)
+CHECKS = {
+    "app.main": (300, HEAVY + ("apscheduler", "fastapi", "sqlalchemy")),
+    "app.api": (1500, HEAVY),
+    "app.worker.shards": (1000, HEAVY),
+}
+
+
+def import_profile(module: str) -> tuple[float, set[str]]:
+    """(cumulative import ms of `module`, every module imported) from a fresh interpreter."""
+    env = {**os.environ}
+    # app.db builds its engine on import; it never connects, but needs a URL
+    env.setdefault("DATABASE_URL", "postgresql://bench@localhost/bench")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} falló:\n{proc.stderr[-2000:]}")
+
+    cumulative_us, imported = 0, set()
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        imported.add(name)
+        if name == module:
+            cumulative_us = int(cumulative)
+    return cumulative_us / 1000, imported
+
+
+def check(budgets: dict[str, float]) -> bool:
+    ok = True
+    for module, (_, forbidden) in CHECKS.items():
+        ms, imported = import_profile(module)
+        heavy = sorted({name.split(".")[0] for name in imported} & set(forbidden))
+        over = ms > budgets[module]
+        status = "OK" if not over and not heavy else "FALLA"
+        print(f"[importtime] {status} {module}: {ms:.0f} ms (presupuesto {budgets[module]:.0f} ms)")
+        if heavy:
+            print(f"[importtime]   importa {', '.join(heavy)}")
+        ok = ok and status == "OK"
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Presupuesto de tiempo de import por entry point")
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULO=MS")
+    args = parser.parse_args()
+
+    budgets = {module: budget for module, (budget, _) in CHECKS.items()}
+    for item in args.budget:
+        module, ms = item.split("=")
+        budgets[module] = float(ms)
+    sys.exit(0 if check(budgets) else 1)
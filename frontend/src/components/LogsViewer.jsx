@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card'
 import { Badge } from '@/components/ui/badge'
 import { Button } from '@/components/ui/button'
@@ -9,9 +9,11 @@ import {
 const STATUS_COLORS = {
   pipeline_started: 'bg-blue-100 text-blue-800',
   pipeline_completed: 'bg-green-100 text-green-800',
+  pipeline_resumed: 'bg-blue-100 text-blue-800',
   scraping: 'bg-yellow-100 text-yellow-800',
   scraping_done: 'bg-green-100 text-green-800',
   scraping_failed: 'bg-red-100 text-red-800',
+  load_skipped: 'bg-gray-100 text-gray-800',
   login_started: 'bg-blue-100 text-blue-800',
   login_done: 'bg-green-100 text-green-800',
   login_skipped: 'bg-gray-100 text-gray-800',
@@ -19,6 +21,12 @@ const STATUS_COLORS = {
   transform_started: 'bg-blue-100 text-blue-800',
   transform_done: 'bg-green-100 text-green-800',
   transform_failed: 'bg-red-100 text-red-800',
+  browser_pool_closed: 'bg-gray-100 text-gray-800',
+  stages_summary: 'bg-gray-100 text-gray-800',
+  shards_created: 'bg-blue-100 text-blue-800',
+  shard_started: 'bg-yellow-100 text-yellow-800',
+  shard_done: 'bg-green-100 text-green-800',
+  shard_failed: 'bg-red-100 text-red-800',
 }
 
 function formatDate(iso) {
@@ -34,35 +42,77 @@ function shortId(uuid) {
   return uuid ? uuid.slice(0, 8) : '—'
 }
 
+// The detail table doesn't show run_id/client_id/details — skip them on the wire
+const LOG_FIELDS = 'id,created_at,client,status,rows_count,error_message'
+
 export default function LogsViewer() {
   const [runs, setRuns] = useState([])
+  const [runsCursor, setRunsCursor] = useState(null)
   const today = new Date().toISOString().slice(0, 10)
   const [dateFrom, setDateFrom] = useState(today)
   const [dateTo, setDateTo] = useState(today)
   const [selectedRun, setSelectedRun] = useState(null)
   const [logs, setLogs] = useState([])
+  const [logsCursor, setLogsCursor] = useState(null)
   const [loading, setLoading] = useState(false)
+  const [live, setLive] = useState(false)
+  const streamRef = useRef(null)
 
-  const fetchRuns = async () => {
+  const fetchRuns = async (cursor = null) => {
     setLoading(true)
     const params = new URLSearchParams()
     if (dateFrom) params.set('date_from', dateFrom)
     if (dateTo) params.set('date_to', dateTo)
+    if (cursor) params.set('cursor', cursor)
     const res = await fetch(`/api/runs?${params}`)
     const data = await res.json()
-    setRuns(data)
+    setRuns((prev) => (cursor ? [...prev, ...data.items] : data.items))
+    setRunsCursor(data.next_cursor)
     setLoading(false)
   }
 
-  const fetchLogs = async (runId) => {
-    const res = await fetch(`/api/runs/${runId}/logs`)
+  const fetchLogs = async (runId, cursor = null) => {
+    const params = new URLSearchParams({ fields: LOG_FIELDS })
+    if (cursor) params.set('cursor', cursor)
+    const res = await fetch(`/api/runs/${runId}/logs?${params}`)
     const data = await res.json()
-    setLogs(data)
+    setLogs((prev) => (cursor ? [...prev, ...data.items] : data.items))
+    setLogsCursor(data.next_cursor)
     setSelectedRun(runId)
   }
 
+  const closeStream = () => {
+    streamRef.current?.close()
+    streamRef.current = null
+    setLive(false)
+  }
+
+  // Runs still in progress are followed over SSE instead of polling
+  const openRun = (run) => {
+    closeStream()
+    if (run.completed) {
+      fetchLogs(run.run_id)
+      return
+    }
+    setSelectedRun(run.run_id)
+    setLogs([])
+    setLogsCursor(null)
+    const source = new EventSource(`/api/runs/${run.run_id}/stream`)
+    source.addEventListener('log', (e) => {
+      const log = JSON.parse(e.data)
+      setLogs((prev) => (prev.some((l) => l.id === log.id) ? prev : [...prev, log]))
+    })
+    source.addEventListener('end', () => {
+      closeStream()
+      fetchRuns()
+    })
+    streamRef.current = source
+    setLive(true)
+  }
+
   useEffect(() => {
     fetchRuns()
+    return () => streamRef.current?.close()
   }, [])
 
   return (
@@ -89,7 +139,7 @@ export default function LogsViewer() {
                 className="border rounded px-3 py-2 text-sm"
               />
             </div>
-            <Button onClick={fetchRuns} disabled={loading}>
+            <Button onClick={() => fetchRuns()} disabled={loading}>
               {loading ? 'Cargando...' : 'Filtrar'}
             </Button>
           </div>
@@ -113,6 +163,7 @@ export default function LogsViewer() {
                   <TableHead>Fin</TableHead>
                   <TableHead>Clientes OK</TableHead>
                   <TableHead>Fallidos</TableHead>
+                  <TableHead>Sin cambios</TableHead>
                   <TableHead>Transform</TableHead>
                   <TableHead>Filas</TableHead>
                   <TableHead></TableHead>
@@ -123,7 +174,7 @@ export default function LogsViewer() {
                   <TableRow
                     key={run.run_id}
                     className={selectedRun === run.run_id ? 'bg-muted' : 'cursor-pointer hover:bg-muted/50'}
-                    onClick={() => fetchLogs(run.run_id)}
+                    onClick={() => openRun(run)}
                   >
                     <TableCell className="font-mono text-xs">
                       {shortId(run.run_id)}
@@ -140,6 +191,9 @@ export default function LogsViewer() {
                         <Badge className="bg-gray-100 text-gray-600">0</Badge>
                       )}
                     </TableCell>
+                    <TableCell>
+                      <Badge className="bg-gray-100 text-gray-600">{run.clients_skipped ?? 0}</Badge>
+                    </TableCell>
                     <TableCell>
                       {run.transform_ok ? (
                         <Badge className="bg-green-100 text-green-800">OK</Badge>
@@ -151,7 +205,7 @@ export default function LogsViewer() {
                       {run.total_rows ? run.total_rows.toLocaleString() : '—'}
                     </TableCell>
                     <TableCell>
-                      <Button variant="ghost" size="sm" onClick={() => fetchLogs(run.run_id)}>
+                      <Button variant="ghost" size="sm" onClick={() => openRun(run)}>
                         Ver
                       </Button>
                     </TableCell>
@@ -160,6 +214,13 @@ export default function LogsViewer() {
               </TableBody>
             </Table>
           )}
+          {runsCursor && (
+            <div className="mt-4 flex justify-center">
+              <Button variant="outline" size="sm" onClick={() => fetchRuns(runsCursor)} disabled={loading}>
+                Cargar más
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
 
@@ -170,8 +231,9 @@ export default function LogsViewer() {
             <div className="flex items-center justify-between">
               <CardTitle className="text-base">
                 Detalle de ejecución <span className="font-mono text-sm">{shortId(selectedRun)}</span>
+                {live && <Badge className="ml-2 bg-blue-100 text-blue-800">En vivo</Badge>}
               </CardTitle>
-              <Button variant="outline" size="sm" onClick={() => { setSelectedRun(null); setLogs([]) }}>
+              <Button variant="outline" size="sm" onClick={() => { closeStream(); setSelectedRun(null); setLogs([]); setLogsCursor(null) }}>
                 Cerrar
               </Button>
             </div>
@@ -207,6 +269,13 @@ export default function LogsViewer() {
                 ))}
               </TableBody>
             </Table>
+            {logsCursor && (
+              <div className="mt-4 flex justify-center">
+                <Button variant="outline" size="sm" onClick={() => fetchLogs(selectedRun, logsCursor)}>
+                  Cargar más
+                </Button>
+              </div>
+            )}
           </CardContent>
         </Card>
       )}
@@ -0,0 +1,90 @@
+"""HttpExporter against tools.mock_reply_io, served in-process over ASGI."""
+import asyncio
+import json
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("fastapi")
+pytest.importorskip("multipart")
+pytest.importorskip("dotenv")
+
+from app.scraper.http_export import HttpExporter, SessionExpired  # noqa: E402
+from tools import mock_reply_io  # noqa: E402
+
+BASE_URL = "http://mock.reply.test"
+EXPORT_PATH = "/export/{team_id}/people.csv"
+
+
+def exporter(transport=None) -> HttpExporter:
+    return HttpExporter(
+        base_url=BASE_URL,
+        export_path=EXPORT_PATH,
+        transport=transport or httpx.ASGITransport(app=mock_reply_io.app),
+    )
+
+
+def storage_state(cookies: dict) -> str:
+    """Playwright storage_state JSON holding `cookies` for the mock's host."""
+    return json.dumps({
+        "cookies": [{"name": k, "value": v, "domain": "mock.reply.test"} for k, v in cookies.items()],
+    })
+
+
+async def login() -> str:
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=mock_reply_io.app), base_url=BASE_URL,
+    ) as client:
+        resp = await client.post("/login", data={"email": "a@example.com", "password": "secret"})
+    assert resp.status_code == 302
+    return storage_state(dict(resp.cookies))
+
+
+def test_download_writes_the_export(tmp_path, monkeypatch):
+    monkeypatch.setattr(mock_reply_io, "MOCK_ROWS", 2500)
+    dest = tmp_path / "acme" / "people.csv"
+
+    async def run():
+        async with exporter() as ex:
+            return await ex.download(await login(), 42, dest)
+
+    assert asyncio.run(run()) == dest
+    lines = dest.read_text().splitlines()
+    assert lines[0] == "Email,First Name,Last Name,Account Name,Added On,Sequence"
+    assert len(lines) == 2501
+    assert list(tmp_path.rglob("*.part")) == []
+
+
+def test_redirect_to_login_raises_session_expired(tmp_path):
+    dest = tmp_path / "people.csv"
+
+    async def run():
+        async with exporter() as ex:
+            await ex.download(storage_state({"other": "x"}), 42, dest)
+
+    with pytest.raises(SessionExpired):
+        asyncio.run(run())
+    assert not dest.exists()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_download_removes_partial_file(tmp_path):
+    class BrokenStream(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield b"Email,First Name\n"
+            raise httpx.ReadError("connection reset")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/Home/SwitchTeam":
+            return httpx.Response(302, headers={"location": "/"})
+        return httpx.Response(200, headers={"content-type": "text/csv"}, stream=BrokenStream())
+
+    dest = tmp_path / "people.csv"
+
+    async def run():
+        async with exporter(httpx.MockTransport(handler)) as ex:
+            await ex.download(storage_state({"mock_session": "s"}), 42, dest)
+
+    with pytest.raises(httpx.ReadError):
+        asyncio.run(run())
+    assert list(tmp_path.iterdir()) == []
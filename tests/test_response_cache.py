@@ -0,0 +1,78 @@
+"""ResponseCache and the conditional-GET helpers: pure, no database."""
+import pytest
+
+pytest.importorskip("fastapi")
+
+from starlette.requests import Request  # noqa: E402
+
+from app.response_cache import ResponseCache, encode, etag_response  # noqa: E402
+
+
+def request(if_none_match: str | None = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_matching_if_none_match_is_a_304_without_body():
+    body, etag = encode({"items": [1, 2]})
+
+    response = etag_response(request(f'"other", W/{etag}'), body, etag, "no-cache")
+
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == etag
+
+
+def test_stale_or_missing_if_none_match_gets_the_body():
+    body, etag = encode({"items": [1, 2]})
+
+    for header in (None, '"stale"'):
+        response = etag_response(request(header), body, etag, "no-cache")
+        assert response.status_code == 200
+        assert response.body == body
+        assert response.headers["cache-control"] == "no-cache"
+
+
+def test_etag_follows_the_exact_bytes():
+    assert encode({"a": 1})[1] == encode({"a": 1})[1]
+    assert encode({"a": 1})[1] != encode({"a": 2})[1]
+
+
+def test_invalidate_drops_only_the_prefix():
+    cache = ResponseCache(1 << 20)
+    cache.put("run-a|500", b"a", '"a"', cache.generation)
+    cache.put("run-b|500", b"b", '"b"', cache.generation)
+
+    cache.invalidate("run-a|")
+
+    assert cache.get("run-a|500") is None
+    assert cache.get("run-b|500") == (b"b", '"b"')
+
+
+def test_put_computed_before_an_invalidation_is_discarded():
+    cache = ResponseCache(1 << 20)
+    generation = cache.generation
+    cache.invalidate("run-a|")
+
+    cache.put("run-a|500", b"old", '"old"', generation)
+
+    assert cache.get("run-a|500") is None
+
+
+def test_evicts_least_recently_used_by_size():
+    cache = ResponseCache(10)
+    cache.put("a", b"aaaa", '"a"', 0)
+    cache.put("b", b"bbbb", '"b"', 0)
+    cache.get("a")  # b is now the least recently used
+
+    cache.put("c", b"cccc", '"c"', 0)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size == 8
+
+
+def test_body_larger_than_the_cache_is_not_stored():
+    cache = ResponseCache(3)
+    cache.put("a", b"aaaa", '"a"', 0)
+    assert cache.get("a") is None and cache.size == 0
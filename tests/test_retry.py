@@ -0,0 +1,30 @@
+"""classify_error: which failures the retry phase retries, and how."""
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("playwright")
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("dotenv")
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from app.pipeline.retry import RETRY_POLICIES, classify_error  # noqa: E402
+
+
+@pytest.mark.parametrize("error", [
+    pd.errors.ParserError("Error tokenizing data"),
+    pd.errors.EmptyDataError("No columns to parse from file"),
+    UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte"),
+    ValueError("could not convert"),
+    FileNotFoundError(2, "No such file or directory", "/tmp/acme.csv"),
+    PermissionError(13, "Permission denied", "/tmp/acme.csv"),
+])
+def test_unreadable_csv_is_not_retried(error):
+    assert classify_error(error, "load") == "parse"
+    assert RETRY_POLICIES["parse"]["attempts"] == 0
+
+
+def test_database_errors_while_loading_are_retried():
+    error = OperationalError("COPY", {}, Exception("server closed the connection"))
+    assert classify_error(error, "load") == "db"
+    assert classify_error(RuntimeError("boom"), "load") == "db"
@@ -0,0 +1,96 @@
+"""ScrapeSlots hand-off and longest-first ordering: pure, no database."""
+import asyncio
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("dotenv")
+
+from app.pipeline.scheduler import (  # noqa: E402
+    DEFAULT_WORKSPACE_SECONDS,
+    INTER_WORKSPACE_DELAY,
+    ScrapeSlots,
+    order_longest_first,
+)
+
+
+async def hold(slots: ScrapeSlots, name: str, priority: float, order: list, release: asyncio.Event):
+    async with slots.slot(priority):
+        order.append(name)
+        await release.wait()
+
+
+def test_freed_slot_goes_to_the_highest_priority_then_fifo():
+    async def run():
+        slots = ScrapeSlots(1)
+        order, release = [], asyncio.Event()
+        first = asyncio.create_task(hold(slots, "first", 0, order, release))
+        await asyncio.sleep(0)
+        waiters = [
+            asyncio.create_task(hold(slots, name, priority, order, release))
+            for name, priority in (("low", 1), ("high-a", 5), ("high-b", 5))
+        ]
+        await asyncio.sleep(0)
+        assert order == ["first"]
+
+        release.set()
+        await asyncio.gather(first, *waiters)
+        return order
+
+    assert asyncio.run(run()) == ["first", "high-a", "high-b", "low"]
+
+
+def test_cancelled_waiter_does_not_leak_its_slot():
+    async def run():
+        slots = ScrapeSlots(1)
+        order, release = [], asyncio.Event()
+        holder = asyncio.create_task(hold(slots, "holder", 0, order, release))
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(hold(slots, "cancelled", 9, order, release))
+        waiting = asyncio.create_task(hold(slots, "waiting", 1, order, release))
+        await asyncio.sleep(0)
+
+        cancelled.cancel()
+        release.set()
+        await asyncio.gather(holder, waiting)
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+
+        # The slot is free again: taken without waiting
+        await asyncio.wait_for(slots._acquire(0), timeout=0.1)
+        return order
+
+    assert asyncio.run(run()) == ["holder", "waiting"]
+
+
+def test_slot_handed_over_just_before_cancellation_is_passed_on():
+    async def run():
+        slots = ScrapeSlots(1)
+        await slots._acquire(0)
+        cancelled = asyncio.create_task(slots._acquire(9))
+        waiting = asyncio.create_task(slots._acquire(1))
+        await asyncio.sleep(0)
+
+        slots._release()  # resolves the first waiter's future...
+        cancelled.cancel()  # ...which is cancelled before it resumes
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        await asyncio.wait_for(waiting, timeout=0.1)
+        return slots._free
+
+    assert asyncio.run(run()) == 0
+
+
+def test_accounts_ordered_longest_first():
+    accounts = {
+        "one-slow@x.com": [{"id": 1}],
+        "three-unknown@x.com": [{"id": 2}, {"id": 3}, {"id": 4}],
+        "one-fast@x.com": [{"id": 5}],
+    }
+    estimates = {1: 300.0, 5: 20.0}
+
+    ordered = order_longest_first(accounts, estimates)
+
+    # Unknown workspaces count DEFAULT_WORKSPACE_SECONDS, plus delays between them
+    assert 3 * DEFAULT_WORKSPACE_SECONDS + 2 * INTER_WORKSPACE_DELAY > 300
+    assert [email for email, _ in ordered] == ["three-unknown@x.com", "one-slow@x.com", "one-fast@x.com"]
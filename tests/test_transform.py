@@ -0,0 +1,166 @@
+import os
+from datetime import datetime
+
+import pytest
+
+if not os.getenv("TEST_DATABASE_URL"):
+    pytest.skip("TEST_DATABASE_URL no configurada", allow_module_level=True)
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("dotenv")
+
+from sqlalchemy import text  # noqa: E402
+
+from app.pipeline.transform import transform_staging_to_core  # noqa: E402
+
+CLIENT = "Acme"
+
+
+def stage(engine, rows, client=CLIENT):
+    """Replace `client`'s staging rows with (email, first_name) pairs."""
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM staging.contacts_report WHERE client = :client"), {"client": client})
+        if rows:
+            conn.execute(
+                text("""
+                    INSERT INTO staging.contacts_report (email, first_name, adding_date, client)
+                    VALUES (:email, :first_name, :adding_date, :client)
+                """),
+                [
+                    {"email": email, "first_name": name, "adding_date": datetime(2024, 1, 1), "client": client}
+                    for email, name in rows
+                ],
+            )
+
+
+def core_rows(engine, client=CLIENT):
+    with engine.connect() as conn:
+        return sorted(
+            conn.execute(
+                text("SELECT email, first_name, domain FROM core.contacts_report WHERE client = :client"),
+                {"client": client},
+            ).fetchall(),
+            key=lambda r: (r[0] or "", r[1] or ""),
+        )
+
+
+def test_first_sync_inserts_everything(db):
+    stage(db, [("a@x.com", "Ann"), ("b@y.com", "Bob")])
+
+    counts = transform_staging_to_core([CLIENT])
+
+    assert counts == {"inserted": 2, "updated": 0, "deleted": 0, "rows": 2}
+    assert core_rows(db) == [("a@x.com", "Ann", "x.com"), ("b@y.com", "Bob", "y.com")]
+
+
+def test_delta_updates_deletes_and_inserts_only_changes(db):
+    stage(db, [("a@x.com", "Ann"), ("b@y.com", "Bob"), ("c@z.com", "Cid")])
+    transform_staging_to_core([CLIENT])
+
+    stage(db, [("a@x.com", "Ann"), ("b@y.com", "Robert"), ("d@w.com", "Dee")])
+    counts = transform_staging_to_core([CLIENT])
+
+    assert counts == {"inserted": 1, "updated": 1, "deleted": 1, "rows": 3}
+    assert core_rows(db) == [
+        ("a@x.com", "Ann", "x.com"),
+        ("b@y.com", "Robert", "y.com"),
+        ("d@w.com", "Dee", "w.com"),
+    ]
+
+
+def test_unchanged_export_is_a_no_op(db):
+    stage(db, [("a@x.com", "Ann")])
+    transform_staging_to_core([CLIENT])
+
+    counts = transform_staging_to_core([CLIENT])
+
+    assert counts == {"inserted": 0, "updated": 0, "deleted": 0, "rows": 1}
+
+
+def test_repeated_and_missing_emails_are_kept_like_staging(db):
+    stage(db, [("a@x.com", "Ann"), ("a@x.com", "Ann B"), (None, "Nobody"), (None, "Nobody")])
+    transform_staging_to_core([CLIENT])
+
+    assert core_rows(db) == [
+        (None, "Nobody", None),
+        (None, "Nobody", None),
+        ("a@x.com", "Ann", "x.com"),
+        ("a@x.com", "Ann B", "x.com"),
+    ]
+
+    # The repeated email becomes unique again: one keyed row remains
+    stage(db, [("a@x.com", "Ann")])
+    transform_staging_to_core([CLIENT])
+
+    assert core_rows(db) == [("a@x.com", "Ann", "x.com")]
+
+
+def test_unchanged_unkeyed_rows_are_not_rewritten(db):
+    rows = [("a@x.com", "Ann"), ("a@x.com", "Ann B"), (None, "Nobody"), (None, "Nobody"), (None, "Other")]
+    stage(db, rows)
+    transform_staging_to_core([CLIENT])
+
+    counts = transform_staging_to_core([CLIENT])
+    assert counts == {"inserted": 0, "updated": 0, "deleted": 0, "rows": 5}
+
+    # One copy fewer, one changed: only those rows move
+    stage(db, [("a@x.com", "Ann"), ("a@x.com", "Ann B"), (None, "Nobody"), (None, "Someone")])
+    counts = transform_staging_to_core([CLIENT])
+
+    assert counts == {"inserted": 1, "updated": 0, "deleted": 2, "rows": 4}
+    assert core_rows(db) == [
+        (None, "Nobody", None),
+        (None, "Someone", None),
+        ("a@x.com", "Ann", "x.com"),
+        ("a@x.com", "Ann B", "x.com"),
+    ]
+
+
+def test_rows_total_follows_the_delta(db):
+    stage(db, [("a@x.com", "Ann")])
+    stage(db, [("o@x.com", "Other"), ("p@x.com", "Pat")], client="Other")
+    transform_staging_to_core([CLIENT, "Other"])
+
+    stage(db, [("a@x.com", "Ann"), ("b@y.com", "Bob"), (None, "Nobody")])
+    counts = transform_staging_to_core([CLIENT])
+
+    with db.connect() as conn:
+        assert counts["rows"] == conn.execute(text("SELECT COUNT(*) FROM core.contacts_report")).scalar() == 5
+
+
+def test_other_clients_are_untouched(db):
+    stage(db, [("a@x.com", "Ann")])
+    stage(db, [("o@x.com", "Other")], client="Other")
+    transform_staging_to_core([CLIENT, "Other"])
+
+    stage(db, [], client="Other")
+    transform_staging_to_core([CLIENT])
+
+    assert core_rows(db, "Other") == [("o@x.com", "Other", "x.com")]
+
+
+def view_rows(engine, client=CLIENT):
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT COUNT(*) FROM core.contacts_report_with_periods_mv WHERE client = :client"),
+            {"client": client},
+        ).scalar()
+
+
+def test_refresh_left_pending_is_retried_by_the_next_transform(db, monkeypatch):
+    import app.pipeline.transform as transform
+
+    def broken_refresh():
+        raise RuntimeError("refresh interrumpido")
+
+    stage(db, [("a@x.com", "Ann")])
+    monkeypatch.setattr(transform, "refresh_report_view", broken_refresh)
+    with pytest.raises(RuntimeError):
+        transform_staging_to_core([CLIENT])
+    monkeypatch.undo()
+    assert view_rows(db) == 0
+
+    # Nothing changed since, but the view is still behind the committed sync
+    counts = transform_staging_to_core([CLIENT])
+
+    assert counts["inserted"] == 0
+    assert view_rows(db) == 1
@@ -0,0 +1,125 @@
+"""Local stand-in for Reply.io: login, SwitchTeam, People page and CSV export (offline testing).
+
+Usage:
+    uvicorn tools.mock_reply_io:app --port 8010
+
+    REPLY_BASE_URL=http://localhost:8010 \
+    REPLY_EXPORT_PATH=/export/{team_id}/people.csv \
+    python3 -m app.main --now
+
+POST /login (any email/password) issues the session cookie; requests without
+it are redirected to /login, like the real app. The People page has the
+controls the Playwright scraper clicks through (All tab, select control,
+More > Export to CSV > Basic fields), so the browser path works too; leave
+REPLY_EXPORT_PATH empty to benchmark it.
+
+MOCK_ROWS sets how many contacts each workspace export contains (rows come
+from benchmarks.generate_csv). MOCK_LATENCY_MS delays every response and
+MOCK_EXPORT_DELAY_MS adds time for the export to "build" before it streams.
+"""
+import asyncio
+import os
+import random
+
+from fastapi import FastAPI, Form, Request
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+
+from benchmarks.generate_csv import people_csv_chunks
+
+MOCK_ROWS = int(os.getenv("MOCK_ROWS", "1000"))
+MOCK_LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "0"))
+MOCK_EXPORT_DELAY_MS = float(os.getenv("MOCK_EXPORT_DELAY_MS", "0"))
+SESSION_COOKIE = "mock_session"
+TEAM_COOKIE = "mock_team"
+
+app = FastAPI(title="Mock Reply.io")
+
+
+@app.middleware("http")
+async def latency(request: Request, call_next):
+    if MOCK_LATENCY_MS:
+        # ±20% so concurrent requests don't move in lockstep
+        await asyncio.sleep(MOCK_LATENCY_MS * random.uniform(0.8, 1.2) / 1000)
+    return await call_next(request)
+
+
+def _logged_in(request: Request) -> bool:
+    return bool(request.cookies.get(SESSION_COOKIE))
+
+
+@app.get("/", response_class=HTMLResponse)
+def home(request: Request):
+    if not _logged_in(request):
+        return RedirectResponse("/login", status_code=302)
+    return "<h1>Mock Reply.io</h1>"
+
+
+@app.get("/login", response_class=HTMLResponse)
+def login_page():
+    return """
+        <form method="post" action="/login">
+            <input name="email" type="email">
+            <input name="password" type="password">
+            <button type="submit">Sign in</button>
+        </form>
+    """
+
+
+@app.post("/login")
+def login(email: str = Form(...), password: str = Form(...)):
+    resp = RedirectResponse("/", status_code=302)
+    resp.set_cookie(SESSION_COOKIE, f"session-{abs(hash(email))}", max_age=86400)
+    return resp
+
+
+@app.get("/Home/SwitchTeam")
+def switch_team(request: Request, teamId: int):
+    if not _logged_in(request):
+        return RedirectResponse("/login", status_code=302)
+    resp = RedirectResponse("/", status_code=302)
+    resp.set_cookie(TEAM_COOKIE, str(teamId))
+    return resp
+
+
+@app.get("/Dashboard/Material", response_class=HTMLResponse)
+def people_page(request: Request):
+    """People list (#/people/list): each menu appears once the previous control is used."""
+    if not _logged_in(request):
+        return RedirectResponse("/login", status_code=302)
+    team_id = int(request.cookies.get(TEAM_COOKIE, "0"))
+    return f"""
+        <div id="tabs"><a href="#" id="all-tab">All ({MOCK_ROWS})</a></div>
+        <button data-test-id="select-control-button">Select</button>
+        <div id="select-menu" hidden><a href="#" id="all-in-list">All in list</a></div>
+        <button id="more" disabled>More</button>
+        <div id="more-menu" hidden>
+            <div id="export-csv">Export to CSV</div>
+            <div id="export-menu" hidden>
+                <a href="/export/{team_id}/people.csv" download="people.csv">Basic fields</a>
+            </div>
+        </div>
+        <script>
+            const show = id => document.getElementById(id).hidden = false;
+            document.querySelector('[data-test-id="select-control-button"]')
+                .addEventListener("click", () => show("select-menu"));
+            document.getElementById("all-in-list").addEventListener("click", e => {{
+                e.preventDefault();
+                document.getElementById("more").disabled = false;
+            }});
+            document.getElementById("more").addEventListener("click", () => show("more-menu"));
+            document.getElementById("export-csv").addEventListener("mouseenter", () => show("export-menu"));
+        </script>
+    """
+
+
+@app.get("/export/{team_id}/people.csv")
+async def export_people(request: Request, team_id: int):
+    if not _logged_in(request):
+        return RedirectResponse("/login", status_code=302)
+    if MOCK_EXPORT_DELAY_MS:
+        await asyncio.sleep(MOCK_EXPORT_DELAY_MS / 1000)
+    return StreamingResponse(
+        people_csv_chunks(team_id, MOCK_ROWS),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="people.csv"'},
+    )